@@ -0,0 +1,311 @@
+"""
+Vectorized version of the blackjackr2 simulator.
+
+Instead of one Python object per seat and per card, every table is a row
+in a set of NumPy arrays (shoe position, hand totals, ace flags, bankrolls,
+running counts) and all of the tables are played in lockstep. Hands are
+stored as a hard total with aces counted as 1 plus a flag saying whether
+the hand holds an ace, so the best value is hard + 10 if that doesn't bust.
+
+The house rules are the ones in blackjackr2.runtest, quirks included:
+the dealer hits anything under 18, a player blackjack is paid 1.5 on
+the deal and is still settled against the dealer afterwards, ties go to
+the dealer, and a dealer bust pays every seat. Bets too: runtest
+decides the bet once, before the first hand, when the count is still
+zero, so it always bets low. Betting from the true count at the start of
+every round has to be asked for with bet_once=False.
+"""
+import numpy as np
+
+DECK = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10]
+
+HILO = {"2": 1, "3": 1, "4": 1, "5": 1, "6": 1,
+        "7": 0, "8": 0, "9": 0, "10": -1, "A": -1}
+
+
+def count_table(countsystem):
+    """
+    Turn a blackjackr2 style count system keyed on card labels into an
+    array indexed by card value, with the ace at index 1.
+    """
+    table = np.zeros(11, dtype=np.int32)
+    for card, value in countsystem.items():
+        table[1 if card == "A" else int(card)] = value
+    return table
+
+
+def hand_value(hard, ace):
+    """
+    Best value of hands given their hard totals and ace flags.
+    """
+    return hard + 10 * (ace & (hard <= 11))
+
+
+class TableBatch(object):
+    """
+    The state of many independent tables that are played in lockstep.
+
+    Parameters
+    ----------
+    ntables : int
+        The number of independent tables.
+    num_players : int
+        The number of seats at each table.
+    numdecks : int
+        The shoe size, in the same units as blackjackr2.shoe.
+    initial_bank : float
+        The starting bankroll of every seat.
+    countsystem : dict
+        The card counting system, keyed on card labels.
+    countaccuracy : int
+        Each seat misses a card with probability 1/(countaccuracy + 1).
+    decksets : int
+        As in blackjackr2.shoe.
+    seed : None, int, SeedSequence or Generator
+        Passed to np.random.default_rng.
+    common_shoes : bool
+        If True, the order of the cards in each shoe only depends on the
+        seed, the table and how many times that table has shuffled, not on
+        how the cards were played. Batches with the same seed then see the
+        same shoes whatever strategy they use.
+    """
+
+    def __init__(self, ntables, num_players, numdecks=1, initial_bank=1000,
+                 countsystem=HILO, countaccuracy=50, decksets=4, seed=None,
+                 common_shoes=False):
+        self.rng = np.random.default_rng(seed)
+        self.common_shoes = common_shoes
+        if self.common_shoes:
+            self.shoekey = int(self.rng.integers(2**63))
+            self.nshuffles = np.zeros(ntables, dtype=np.int64)
+        self.ntables = ntables
+        self.nseats = num_players
+        self.numdecks = numdecks
+        self.countvalues = count_table(countsystem)
+        self.p_count = countaccuracy / (countaccuracy + 1.)
+
+        base = np.tile(np.array(DECK, dtype=np.int8),
+                       decksets * len(DECK) * numdecks)
+        self.shoesize = base.size
+        self.base = base
+        self.shoes = np.empty((ntables, base.size), dtype=np.int8)
+        self.shoes[:] = base
+        self.pos = np.zeros(ntables, dtype=np.intp)
+        self.yellowcard = np.zeros(ntables, dtype=np.intp)
+        self.mycount = np.zeros((ntables, num_players), dtype=np.int64)
+        self.bank = np.empty((ntables, num_players))
+        self.bank.fill(initial_bank)
+        self.nrounds = 0
+        self.shuffle(np.arange(ntables))
+
+    def shuffle(self, tables):
+        """
+        Reshuffle the shoes of `tables` and reset their counts.
+        """
+        if self.common_shoes:
+            self._shuffle_common(tables)
+        else:
+            rng = self.rng
+            self.shoes[tables] = rng.permuted(self.shoes[tables], axis=1)
+            self.yellowcard[tables] = rng.integers(self.shoesize // 2,
+                                                   self.shoesize - 30,
+                                                   size=len(tables))
+        self.pos[tables] = 0
+        self.mycount[tables] = 0
+
+    def _shuffle_common(self, tables):
+        for table in tables:
+            rng = np.random.default_rng([self.shoekey, table,
+                                         self.nshuffles[table]])
+            self.shoes[table] = rng.permutation(self.base)
+            self.yellowcard[table] = rng.integers(self.shoesize // 2,
+                                                  self.shoesize - 30)
+        self.nshuffles[tables] += 1
+
+    def deal(self, tables):
+        """
+        Deal one card at each of `tables`. Every seat at those tables
+        counts the card unless they misread it.
+        """
+        cards = self.shoes[tables, self.pos[tables]]
+        self.pos[tables] += 1
+        seen = self.rng.random((len(tables), self.nseats)) < self.p_count
+        self.mycount[tables] += self.countvalues[cards][:, None] * seen
+        # a very long round can run off the end of a shoe
+        empty = tables[self.pos[tables] >= self.shoesize]
+        if len(empty):
+            self.shuffle(empty)
+        return cards
+
+    def truecount(self, seat=slice(None)):
+        return self.mycount[:, seat] / float(self.numdecks)
+
+
+def _record_card(cards, ncards, tables, seat, card):
+    # cards past the width of `cards` are only counted
+    n = ncards[tables, seat]
+    kept = n < cards.shape[2]
+    cards[tables[kept], seat, n[kept]] = card[kept]
+    ncards[tables, seat] += 1
+
+
+def play_round(batch, lowbet=25, hibet=100, counting=True, bet_count=10,
+               hit_counts=(-10, -15), recorder=None):
+    """
+    Play one round at every table in `batch`, updating it in place.
+
+    Parameters
+    ----------
+    batch : TableBatch
+        The tables to play.
+    lowbet, hibet : float or ndarray
+        The bets placed when the true count is at most / above `bet_count`.
+        Arrays give a bet for each (table, seat).
+    counting : bool
+        Whether the seats use the count to take extra cards.
+    bet_count : float
+        The true count above which a seat bets `hibet`.
+    hit_counts : tuple
+        A seat takes an extra card on 12 or less if its true count is below
+        the first value and on 15 or less if below the second.
+    recorder : blackjack_events.HandRecorder, optional
+        If given, every seat's hand is recorded.
+
+    Returns
+    -------
+    delta : ndarray
+        The (ntables, nseats) change in every bankroll.
+    """
+    ntables, nseats = batch.ntables, batch.nseats
+    alltables = np.arange(ntables)
+    truecount = batch.truecount()
+    bet = np.where(truecount > bet_count, hibet, lowbet)
+
+    hard = np.zeros((ntables, nseats), dtype=np.int16)
+    ace = np.zeros((ntables, nseats), dtype=bool)
+    dhard = np.zeros(ntables, dtype=np.int16)
+    dace = np.zeros(ntables, dtype=bool)
+    if recorder is not None:
+        width = recorder.dtype["cards"].shape[0]
+        cards = np.zeros((ntables, nseats, width), dtype=np.int8)
+        ncards = np.empty((ntables, nseats), dtype=np.int8)
+        ncards.fill(2)
+
+    # Initial deal
+    for i in range(2):
+        for seat in range(nseats):
+            card = batch.deal(alltables)
+            hard[:, seat] += card
+            ace[:, seat] |= card == 1
+            if recorder is not None:
+                cards[:, seat, i] = card
+        card = batch.deal(alltables)
+        dhard += card
+        dace |= card == 1
+        if i == 0:
+            upcard = card
+
+    # Check for blackjack
+    natural = hand_value(hard, ace) == 21
+    delta = np.where(natural, 1.5 * bet, 0.)
+
+    # Player options. Everyone hits to 11, then to 17 against a 7-A
+    # and to 19 against a 2-6
+    hitto = np.where((upcard >= 7) | (upcard == 1), 16, 18)
+    for seat in range(nseats):
+        active = ~natural[:, seat]
+        while True:
+            value = hand_value(hard[:, seat], ace[:, seat])
+            tables = np.flatnonzero(active & (value <= hitto))
+            if not len(tables):
+                break
+            card = batch.deal(tables)
+            hard[tables, seat] += card
+            ace[tables, seat] |= card == 1
+            if recorder is not None:
+                _record_card(cards, ncards, tables, seat, card)
+        if counting:
+            for limit, count in zip((12, 15), hit_counts):
+                value = hand_value(hard[:, seat], ace[:, seat])
+                tables = np.flatnonzero(active & (value <= limit) &
+                                        (batch.truecount(seat) < count))
+                card = batch.deal(tables)
+                hard[tables, seat] += card
+                ace[tables, seat] |= card == 1
+                if recorder is not None:
+                    _record_card(cards, ncards, tables, seat, card)
+
+    # Dealer options
+    while True:
+        tables = np.flatnonzero(hand_value(dhard, dace) < 18)
+        if not len(tables):
+            break
+        card = batch.deal(tables)
+        dhard[tables] += card
+        dace[tables] |= card == 1
+
+    # Settle up. A dealer bust pays everyone, a dealer 21 beats everyone,
+    # otherwise the seat wins only if it beats the dealer without busting
+    dealer = hand_value(dhard, dace)[:, None]
+    player = hand_value(hard, ace)
+    win = (dealer > 21) | ((dealer < 21) & (player <= 21) & (player > dealer))
+    delta += np.where(win, bet, -bet)
+    batch.bank += delta
+
+    if recorder is not None:
+        recorder.record(round=batch.nrounds, table=alltables[:, None],
+                        seat=np.arange(nseats), card1=cards[..., 0],
+                        card2=cards[..., 1], ncards=ncards, cards=cards,
+                        total=np.minimum(player, 22), upcard=upcard[:, None],
+                        dealer=np.minimum(dealer, 22), truecount=truecount,
+                        bet=bet, outcome=delta)
+    batch.nrounds += 1
+
+    # Cleanup stage
+    reset = np.flatnonzero(batch.pos > batch.yellowcard)
+    if len(reset):
+        batch.shuffle(reset)
+    return delta
+
+
+def runtest(num_players, ntables=1000, iterations=1000, numdecks=1,
+            initial_bank=1000, counting=True, lowbet=25, hibet=100,
+            countsystem=HILO, countaccuracy=50, bet_count=10,
+            hit_counts=(-10, -15), seed=None, recorder=None,
+            common_shoes=False, bet_once=True):
+    """
+    Play `iterations` rounds at `ntables` independent tables at once.
+
+    If `bet_once` is True, each seat's bet is decided from the count
+    before the first round and kept for the whole run, as in
+    blackjackr2.runtest. The count of a fresh shoe is zero, so that is
+    always `lowbet`. If it is False, seats bet `hibet` in every round
+    that starts with a true count above `bet_count`.
+
+    The other arguments are those of blackjackr2.runtest, play_round and
+    TableBatch.
+
+    Returns
+    -------
+    bank : ndarray
+        The (ntables, num_players) final bankrolls.
+    """
+    batch = TableBatch(ntables, num_players, numdecks, initial_bank,
+                       countsystem, countaccuracy, seed=seed,
+                       common_shoes=common_shoes)
+    if bet_once:
+        lowbet = hibet = np.where(batch.truecount() > bet_count, hibet, lowbet)
+    for z in range(iterations):
+        play_round(batch, lowbet, hibet, counting, bet_count, hit_counts,
+                   recorder)
+    return batch.bank
+
+
+def runlayer1(ntables=100, iterations=100, seed=None):
+    """
+    The batched equivalent of blackjackr2.runlayer1. Returns the average
+    return across `ntables` single-seat tables after `iterations` hands.
+    """
+    bank = runtest(1, ntables=ntables, numdecks=1, iterations=iterations,
+                   counting=False, seed=seed)
+    return ((bank - 1000) / 1000).mean(0)
@@ -0,0 +1,119 @@
+"""
+Estimate blackjack returns with confidence intervals using fewer hands.
+
+The unit of replication is a table, and a table's return is its average
+bankroll change per seat per round. Two variance reduction techniques
+are available, and they can be combined.
+
+* Common random numbers. Strategies are compared on exactly the same
+  shoes (see blackjack_batch.TableBatch), so compare() estimates the
+  difference from paired tables.
+* Control variates. A control strategy is played on the same shoes, and
+  the estimate is corrected by how far the control's sample mean is from
+  its expected return. Nothing here knows that expected return exactly.
+  blackjack_exact only covers a single round dealt from a given shoe, not
+  a run through a shoe down to the cut card. The caller has to supply the
+  expected return, usually from one much longer run of estimate(control)
+  with another seed.
+
+Dealing each pair of tables the same shoe forwards and reversed gave no
+variance reduction, so antithetic shoes are not offered.
+"""
+from collections import namedtuple
+from statistics import NormalDist
+
+import numpy as np
+
+import blackjack_batch
+
+Estimate = namedtuple("Estimate", ["mean", "stderr", "lower", "upper", "n"])
+
+# the strategy used by blackjackr2.runlayer1: the fixed hitting rules and
+# a flat low bet, without counting. It is not blackjack basic strategy.
+NO_COUNT = {"counting": False, "bet_once": True}
+
+
+def table_returns(params, ntables=1000, iterations=1000, seed=0):
+    """
+    The average return per seat per round of every table.
+
+    Parameters
+    ----------
+    params : dict
+        Arguments for blackjack_batch.runtest. num_players defaults to 1.
+    ntables : int
+        The number of tables.
+    iterations : int
+        The number of rounds played at each table.
+    seed : int
+        The seed. Runs with the same seed are played on the same shoes.
+    """
+    kwargs = {"num_players": 1}
+    kwargs.update(params)
+    bank = blackjack_batch.runtest(ntables=ntables, iterations=iterations,
+                                   seed=seed, common_shoes=True, **kwargs)
+    return (bank - kwargs.get("initial_bank", 1000)).mean(1) / iterations
+
+
+def summarize(samples, level=0.95):
+    """
+    The mean of independent `samples` with a normal confidence interval.
+    """
+    samples = np.asarray(samples)
+    n = len(samples)
+    mean = samples.mean()
+    stderr = samples.std(ddof=1) / np.sqrt(n)
+    z = NormalDist().inv_cdf(.5 + level / 2.)
+    return Estimate(mean, stderr, mean - z * stderr, mean + z * stderr, n)
+
+
+def estimate(params, ntables=1000, iterations=1000, seed=0, control=None,
+             control_mean=None, level=0.95):
+    """
+    Estimate the expected return per seat per round of a strategy.
+
+    Parameters
+    ----------
+    params : dict
+        Arguments for blackjack_batch.runtest describing the strategy.
+    ntables, iterations, seed
+        See table_returns.
+    control : dict, optional
+        The parameters of a control strategy, e.g. NO_COUNT. It is played
+        on the same shoes and used as a control variate.
+    control_mean : float, optional
+        The expected return of `control`, for the same `iterations`.
+        Required if `control` is given. It usually comes from one much
+        longer run of estimate(control) with a different seed. Its error
+        isn't included in the standard error, so it has to be much
+        smaller than the standard error without the control.
+    level : float
+        The confidence level of the interval.
+
+    Returns
+    -------
+    estimate : Estimate
+        The mean, its standard error and confidence interval, and the
+        number of independent replications it is based on.
+    """
+    y = table_returns(params, ntables, iterations, seed)
+    if control is None:
+        return summarize(y, level)
+    if control_mean is None:
+        raise ValueError("control_mean is needed to use a control")
+    x = table_returns(control, ntables, iterations, seed)
+    xc = x - x.mean()
+    beta = np.dot(xc, y - y.mean()) / np.dot(xc, xc)
+    # beta comes from the same tables, which only matters for small n
+    return summarize(y - beta * (x - control_mean), level)
+
+
+def compare(params_a, params_b, ntables=1000, iterations=1000, seed=0,
+            level=0.95):
+    """
+    Estimate the expected return of strategy a minus that of strategy b
+    by playing both on the same shoes. The arguments are as in estimate.
+    """
+    a = table_returns(params_a, ntables, iterations, seed)
+    b = table_returns(params_b, ntables, iterations, seed)
+    return summarize(a - b, level)
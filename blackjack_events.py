@@ -0,0 +1,170 @@
+"""
+Record every hand played by blackjack_batch to disk.
+
+Hands are copied into a preallocated record buffer and the buffer is
+written out a column at a time whenever it fills up, so memory use stays
+fixed however many hands are played. Each column is a flat binary file
+next to a small JSON file describing the columns, and load_events opens
+them with np.memmap, so the columns can be analyzed without reading them
+all into memory.
+"""
+import json
+import os
+
+import numpy as np
+
+# the number of cards kept of each hand. Hands are padded with zeros, and
+# the rare hand with more cards keeps its first HAND_CARDS, though ncards
+# is still the full count.
+HAND_CARDS = 12
+
+HAND_DTYPE = np.dtype([("round", np.int64),
+                       ("table", np.int32),
+                       ("seat", np.int16),
+                       ("card1", np.int8),
+                       ("card2", np.int8),
+                       ("ncards", np.int8),
+                       ("cards", np.int8, (HAND_CARDS,)),
+                       ("total", np.int8),
+                       ("upcard", np.int8),
+                       ("dealer", np.int8),
+                       ("truecount", np.float32),
+                       ("bet", np.float32),
+                       ("outcome", np.float32)])
+
+
+class HandRecorder(object):
+    """
+    Stream records to a directory of column files.
+
+    Parameters
+    ----------
+    path : str
+        The directory to write to. It is created if it doesn't exist and
+        any columns already in it are appended to, which needs them to
+        have the same names and types as `dtype`.
+    dtype : np.dtype
+        The fields of a record. The default is HAND_DTYPE, which is what
+        blackjack_batch.play_round records.
+    chunksize : int
+        The number of records buffered in memory between writes.
+    """
+
+    def __init__(self, path, dtype=HAND_DTYPE, chunksize=2**16):
+        if not os.path.exists(path):
+            os.makedirs(path)
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.buffer = np.empty(chunksize, dtype=self.dtype)
+        self.nbuffered = 0
+        self.nrows = 0
+        if _has_meta(path):
+            meta = _read_meta(path)
+            if meta["columns"] != _columns(self.dtype):
+                raise ValueError("%s holds columns %s, not %s"
+                                 % (path, meta["columns"],
+                                    _columns(self.dtype)))
+            self.nrows = meta["nrows"]
+        self.closed = False
+        self.files = dict((name, open(_column_path(path, name), "ab"))
+                          for name in self.dtype.names)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def record(self, **columns):
+        """
+        Add records. The columns are broadcast against each other, so a
+        scalar or a (ntables, 1) array can be given alongside a
+        (ntables, nseats) array. Fields with a shape of their own, like
+        cards, have those axes last.
+        """
+        names = self.dtype.names
+        fields = [self.dtype[name].shape for name in names]
+        columns = [np.asarray(columns[name]) for name in names]
+        shape = np.broadcast_shapes(*[value.shape[:value.ndim - len(field)]
+                                      for value, field in zip(columns,
+                                                              fields)])
+        values = [np.broadcast_to(value, shape + field).reshape((-1,) + field)
+                  for value, field in zip(columns, fields)]
+        n = len(values[0])
+        start = 0
+        while start < n:
+            k = min(n - start, len(self.buffer) - self.nbuffered)
+            rows = self.buffer[self.nbuffered:self.nbuffered + k]
+            for name, value in zip(names, values):
+                rows[name] = value[start:start + k]
+            self.nbuffered += k
+            start += k
+            if self.nbuffered == len(self.buffer):
+                self.flush()
+
+    def flush(self):
+        """
+        Write the buffered records to disk.
+        """
+        rows = self.buffer[:self.nbuffered]
+        for name in self.dtype.names:
+            # copy the field so it is written out contiguously
+            np.ascontiguousarray(rows[name]).tofile(self.files[name])
+            self.files[name].flush()
+        self.nrows += self.nbuffered
+        self.nbuffered = 0
+        _write_meta(self.path, self.dtype, self.nrows)
+
+    def close(self):
+        if self.closed:
+            return
+        self.flush()
+        for f in self.files.values():
+            f.close()
+        self.closed = True
+
+
+def load_events(path, mode="r"):
+    """
+    Open the columns written by a HandRecorder as memory-mapped arrays.
+
+    Returns
+    -------
+    columns : dict
+        Maps column names to np.memmap arrays.
+    """
+    meta = _read_meta(path)
+    columns = {}
+    for name, descr, shape in meta["columns"]:
+        shape = (meta["nrows"],) + tuple(shape)
+        if meta["nrows"]:
+            columns[name] = np.memmap(_column_path(path, name), mode=mode,
+                                      dtype=np.dtype(descr), shape=shape)
+        else:
+            columns[name] = np.empty(shape, dtype=np.dtype(descr))
+    return columns
+
+
+def _column_path(path, name):
+    return os.path.join(path, name + ".bin")
+
+
+def _has_meta(path):
+    return os.path.exists(os.path.join(path, "meta.json"))
+
+
+def _read_meta(path):
+    with open(os.path.join(path, "meta.json")) as f:
+        return json.load(f)
+
+
+def _columns(dtype):
+    # the name, type and shape of each column, as they are stored in JSON
+    return [[name, dtype[name].base.str, list(dtype[name].shape)]
+            for name in dtype.names]
+
+
+def _write_meta(path, dtype, nrows):
+    meta = {"nrows": nrows, "columns": _columns(dtype)}
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f)
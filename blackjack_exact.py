@@ -0,0 +1,285 @@
+"""
+Exact blackjack probabilities for a given shoe.
+
+Rather than simulating, these functions work out the probability of every
+way a hand can finish by recursing over the cards that can still be drawn.
+A shoe is described by its composition, a tuple with the number of aces,
+twos, ..., tens (face cards included) left in it. The dealer's recursion
+merges the many orders of drawing the same cards into one state, and
+results for each (hand, composition) are kept in an LRU cache.
+
+The rules are those of blackjackr2.runtest. The dealer hits anything under
+18, a dealer 21 beats everyone, a dealer bust pays everyone, even seats
+that have busted, and ties go to the dealer.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+# the dealer's final totals, in the order dealer_probs returns them
+OUTCOMES = ("18", "19", "20", "21", "bust")
+
+CACHE_SIZE = 2**16
+
+
+def shoe_composition(shoe):
+    """
+    The composition of the cards left in a blackjackr2.shoe.
+    """
+    return tuple(np.bincount(shoe.deck[shoe.count:], minlength=11)[1:].tolist())
+
+
+def _value(hard, ace):
+    return hard + 10 if ace and hard <= 11 else hard
+
+
+def _add(drawn, card):
+    drawn = list(drawn)
+    drawn[card - 1] += 1
+    return tuple(drawn)
+
+
+def _dealer_many(upcard, comps):
+    """
+    The dealer's final-total distribution for each row of `comps`.
+
+    The cards the dealer has drawn fix the dealer's hand whatever the
+    shoe, so the recursion runs forward over the sets of drawn cards one
+    card at a time, carrying the probability of reaching each set for all
+    of the rows at once. Orders that lead to the same set are merged.
+    """
+    comps = np.asarray(comps, dtype=float).T
+    nshoes = comps.shape[1]
+    left = comps.sum(0)
+    probs = np.zeros((5, nshoes))
+    states = [((0,) * 10, upcard, upcard == 1)]
+    reach = np.ones((1, nshoes))
+    while states:
+        drawn = np.array([state[0] for state in states])
+        # (state, card, shoe)
+        p = np.maximum(comps[None] - drawn[:, :, None], 0)
+        np.divide(p, left, out=p, where=left > 0)
+        p *= reach[:, None]
+        p = p.reshape(-1, nshoes)
+
+        # where each (state, card) goes, -1 - outcome if the dealer stops
+        index = {}
+        nextstates = []
+        target = []
+        for state, hard, ace in states:
+            for card in range(1, 11):
+                value = _value(hard + card, ace or card == 1)
+                if value >= 18:
+                    target.append(-1 - min(value - 18, 4))
+                    continue
+                after = _add(state, card)
+                if after not in index:
+                    index[after] = len(nextstates)
+                    nextstates.append((after, hard + card, ace or card == 1))
+                target.append(index[after])
+        target = np.array(target)
+
+        for outcome in range(5):
+            probs[outcome] += p[target == -1 - outcome].sum(0)
+        if nextstates:
+            keep = np.flatnonzero(target >= 0)
+            keep = keep[np.argsort(target[keep], kind="stable")]
+            starts = np.searchsorted(target[keep], np.arange(len(nextstates)))
+            reach = np.add.reduceat(p[keep], starts, axis=0)
+        states = nextstates
+        left = left - 1
+    return probs.T
+
+
+def _settle(values, dealer):
+    """
+    The expected return of hands worth `values` given the distributions
+    of the dealer's final total.
+    """
+    bust = dealer[:, 4]
+    ev = bust - dealer[:, 3]
+    for j, total in enumerate((18, 19, 20)):
+        ev = ev + np.where(values > total, 1, -1) * dealer[:, j]
+    return np.where(values > 21, 2 * bust - 1, ev)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _dealer(upcard, comp):
+    return _dealer_many(upcard, [comp])[0]
+
+
+def _draws(hard, comp):
+    """
+    Every set of cards a hand with this hard total can be hit into, in
+    order of the number of cards, and the index of the set reached by
+    adding each card to each set (-1 if it can't be drawn or the hand has
+    already busted). Whether a hand has busted only depends on its hard
+    total, so the sets for a higher total are a subset of those for a
+    lower one.
+    """
+    index = {(0,) * 10: 0}
+    order = [(0,) * 10]
+    for drawn in order:
+        if hard + sum(card * n for card, n in enumerate(drawn, 1)) > 21:
+            continue
+        for card in range(1, 11):
+            if comp[card - 1] > drawn[card - 1]:
+                after = _add(drawn, card)
+                if after not in index:
+                    index[after] = len(order)
+                    order.append(after)
+    children = [[index.get(_add(drawn, card), -1) for card in range(1, 11)]
+                for drawn in order]
+    return np.array(order), np.array(children)
+
+
+@lru_cache(maxsize=256)
+def _dealer_table(upcard, comp, hard):
+    """
+    The sets of cards from _draws(hard, comp) and the dealer's
+    distribution for the shoe left by each of them, worked out in one
+    pass.
+    """
+    order, children = _draws(hard, comp)
+    return order, children, _dealer_many(upcard, np.array(comp) - order)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _hand(hard, ace, upcard, comp, base):
+    """
+    The stand and hit EVs of a hand. The dealer's distributions come from
+    the table for the hard total `base`, which can be lower than `hard`
+    so that one table serves many hands. The hit EVs are filled in a
+    level at a time from the most cards drawn back down to none.
+    """
+    order, children, dealer = _dealer_table(upcard, comp, base)
+    comps = np.array(comp) - order
+    left = comps.sum(1)
+    p = np.divide(comps, left[:, None], out=np.zeros(comps.shape),
+                  where=left[:, None] > 0)
+    ncards = order.sum(1)
+    hards = hard + np.dot(order, np.arange(1, 11))
+    values = np.where((ace | (order[:, 0] > 0)) & (hards <= 11), hards + 10,
+                      hards)
+    stand = _settle(values, dealer)
+    best = stand.copy()
+    hit = np.empty(len(order))
+    hit.fill(np.nan)
+    for k in range(ncards.max(), -1, -1):
+        rows = np.flatnonzero((ncards == k) & (values <= 21))
+        if not len(rows):
+            continue
+        # a missing child is only ever paired with a zero probability
+        hit[rows] = (p[rows] * best[children[rows]]).sum(1)
+        best[rows] = np.maximum(stand[rows], hit[rows])
+    return stand[0], hit[0]
+
+
+def _check(comp):
+    comp = tuple(int(n) for n in comp)
+    if len(comp) != 10 or min(comp) < 0 or not sum(comp):
+        raise ValueError("comp should be ten non-negative card counts")
+    return comp
+
+
+def dealer_probs(upcard, comp):
+    """
+    The distribution of the dealer's final total.
+
+    Parameters
+    ----------
+    upcard : int
+        The dealer's up card, with the ace as 1.
+    comp : sequence
+        The composition of the shoe after the up card was dealt. The hole
+        card is drawn from it.
+
+    Returns
+    -------
+    probs : ndarray
+        The probabilities of the totals in OUTCOMES.
+    """
+    comp = _check(comp)
+    return _dealer(upcard, comp).copy()
+
+
+def stand_ev(hand, upcard, comp):
+    """
+    The expected return per unit bet of standing on `hand`.
+
+    Parameters
+    ----------
+    hand : sequence
+        The values of the player's cards, with the ace as 1.
+    upcard : int
+        The dealer's up card.
+    comp : sequence
+        The composition of the shoe after the player's cards and the up
+        card were dealt.
+    """
+    comp = _check(comp)
+    value = _value(sum(hand), 1 in hand)
+    return float(_settle(np.array([value]), _dealer(upcard, comp)[None])[0])
+
+
+def hit_ev(hand, upcard, comp):
+    """
+    The expected return per unit bet of taking a card and then playing
+    on optimally. The arguments are those of stand_ev.
+    """
+    comp = _check(comp)
+    hard = int(sum(hand))
+    return _hand(hard, 1 in hand, upcard, comp, hard)[1]
+
+
+def strategy_table(comp, soft=False):
+    """
+    The gain from hitting rather than standing for each total against
+    each up card.
+
+    Only the up card is taken out of `comp`, not the cards that make up
+    the player's total, which is the usual approximation for strategy
+    tables.
+
+    Parameters
+    ----------
+    comp : sequence
+        The composition of the shoe.
+    soft : bool
+        If True, the rows are soft 13 to soft 20, otherwise hard 5 to 20.
+
+    Returns
+    -------
+    totals : ndarray
+        The player totals, one for each row.
+    gain : ndarray
+        hit_ev - stand_ev with a row for each total and a column for each
+        up card from ace to ten. Hitting is better where this is positive.
+    """
+    comp = _check(comp)
+    if soft:
+        totals = np.arange(13, 21)
+        hards = totals - 10
+    else:
+        totals = np.arange(5, 21)
+        hards = totals
+    gain = np.empty((len(totals), 10))
+    for j, upcard in enumerate(range(1, 11)):
+        if not comp[upcard - 1]:
+            gain[:, j] = np.nan
+            continue
+        after = list(comp)
+        after[upcard - 1] -= 1
+        for i, hard in enumerate(hards):
+            stand, hit = _hand(int(hard), soft, upcard, tuple(after),
+                               int(hards[0]))
+            gain[i, j] = hit - stand
+    return totals, gain
+
+
+def clear_cache():
+    """
+    Empty the caches of intermediate results.
+    """
+    for func in (_dealer, _dealer_table, _hand):
+        func.cache_clear()
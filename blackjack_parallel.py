@@ -0,0 +1,90 @@
+"""
+Run blackjackr2 experiments across all of the cores on a machine.
+
+Every replication gets its own child of a single SeedSequence, so the
+random numbers a replication sees depend only on the seed and its index.
+Replications are sent to the workers in chunks to cut down on the cost of
+passing work back and forth, and the results come back in replication
+order, so the answer is the same no matter how many workers are used.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from blackjackr2 import runtest
+
+
+def _run_chunk(func, seeds, pass_seed, kwargs):
+    results = []
+    for seed in seeds:
+        if pass_seed:
+            results.append(func(seed=seed, **kwargs))
+        else:
+            # runtest draws from the global NumPy random state
+            np.random.seed(seed.generate_state(4))
+            results.append(func(**kwargs))
+    return results
+
+
+def run_replications(nreps, func=runtest, seed=None, max_workers=None,
+                     chunksize=None, pass_seed=False, **kwargs):
+    """
+    Run `func` `nreps` times over a pool of processes.
+
+    Parameters
+    ----------
+    nreps : int
+        The number of replications.
+    func : callable
+        A module-level function that returns an array of bankrolls. The
+        default is blackjackr2.runtest.
+    seed : None, int or SeedSequence
+        The root seed. A replication's random numbers depend only on this
+        and the replication's index.
+    max_workers : int, optional
+        The number of processes. Defaults to the number of CPUs.
+    chunksize : int, optional
+        The number of replications sent to a worker at once. Defaults to
+        splitting the work into about four chunks per worker.
+    pass_seed : bool
+        If True, each replication's SeedSequence is passed to `func` as
+        the `seed` keyword instead of being used to seed the global NumPy
+        random state. Use this for the functions in blackjack_batch.
+    kwargs
+        Passed on to `func`.
+
+    Returns
+    -------
+    bank : ndarray
+        The results of the replications stacked in order.
+    """
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    seeds = seed.spawn(nreps)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, -(-nreps // (4 * max_workers)))
+    chunks = [seeds[i:i + chunksize] for i in range(0, nreps, chunksize)]
+
+    with ProcessPoolExecutor(max_workers) as pool:
+        futures = [pool.submit(_run_chunk, func, chunk, pass_seed, kwargs)
+                   for chunk in chunks]
+        results = [result for future in futures
+                   for result in future.result()]
+    return np.array(results)
+
+
+def runlayer1(nreps=100, seed=None, max_workers=None, chunksize=None):
+    """
+    blackjackr2.runlayer1 spread over a pool of processes.
+    """
+    bank = run_replications(nreps, runtest, seed, max_workers, chunksize,
+                            num_players=1, numdecks=1, iterations=100,
+                            counting=False)
+    return ((bank - 1000) / 1000).mean(0)
+
+
+if __name__ == "__main__":
+    print(runlayer1(seed=12345))
@@ -0,0 +1,115 @@
+"""
+Sweep blackjack strategies over a grid of parameters.
+
+Each cell of the grid is run through the simulator and saved to disk
+under a key made from its parameters, the seed and a hash of the
+simulator's source code. Rerunning a sweep only computes the cells that
+aren't already in the cache, and editing the simulator invalidates the
+old results. Every cell uses the same seed, so differences between cells
+are not swamped by differences in the cards that were dealt.
+"""
+import hashlib
+import inspect
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import blackjack_batch
+
+
+def expand_grid(grid):
+    """
+    Turn a dict of lists of values into a list of dicts, one for each
+    combination of values.
+    """
+    names = sorted(grid)
+    return [dict(zip(names, values))
+            for values in itertools.product(*[grid[name] for name in names])]
+
+
+def code_version(func):
+    """
+    A short hash of the source of the module that defines `func`.
+    """
+    source = inspect.getsource(sys.modules[func.__module__])
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()[:12]
+
+
+def cache_key(params, seed, version):
+    key = json.dumps({"params": params, "seed": seed, "version": version},
+                     sort_keys=True, default=str)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def _run_cell(func, params, seed):
+    return func(seed=seed, **params)
+
+
+def sweep(grid, seed=0, cachedir="sweep_cache", func=blackjack_batch.runtest,
+          max_workers=1, version=None, **fixed):
+    """
+    Run `func` for every combination of parameters in `grid`.
+
+    Parameters
+    ----------
+    grid : dict
+        Maps argument names of `func` to lists of values to try, e.g.
+        {"hibet" : [50, 100], "bet_count" : [5, 10]} with
+        bet_once=False.
+    seed : int
+        The seed given to every cell.
+    cachedir : str
+        The directory that holds the cached results.
+    func : callable
+        A module-level function that takes a `seed` keyword and returns
+        an array. The default is blackjack_batch.runtest.
+    max_workers : int
+        The number of processes used to compute the missing cells.
+    version : str, optional
+        The code version used in the cache key. Defaults to a hash of the
+        source of the module that defines `func`.
+    fixed
+        Arguments passed to `func` in every cell, e.g. num_players=1.
+        These are part of the cache key.
+
+    Returns
+    -------
+    results : list
+        A list of (params, result) tuples in the order of expand_grid.
+    """
+    if version is None:
+        version = code_version(func)
+    if not os.path.exists(cachedir):
+        os.makedirs(cachedir)
+
+    cells = []
+    for params in expand_grid(grid):
+        params.update(fixed)
+        path = os.path.join(cachedir, cache_key(params, seed, version) +
+                            ".npy")
+        cells.append((params, path))
+    missing = [(params, path) for params, path in cells
+               if not os.path.exists(path)]
+
+    if max_workers > 1 and len(missing) > 1:
+        with ProcessPoolExecutor(max_workers) as pool:
+            futures = [(pool.submit(_run_cell, func, params, seed), path)
+                       for params, path in missing]
+            for future, path in futures:
+                _save(path, future.result())
+    else:
+        for params, path in missing:
+            _save(path, _run_cell(func, params, seed))
+
+    return [(params, np.load(path)) for params, path in cells]
+
+
+def _save(path, result):
+    # write then rename so an interrupted sweep never leaves half a file
+    tmp = path[:-4] + ".tmp.npy"
+    np.save(tmp, result)
+    os.replace(tmp, path)
@@ -4,8 +4,8 @@ import matplotlib.pyplot as plt
 I decided to make the shoe NumPy and the hand NOT NumPy.
 It made sense to make the shoe NumPy, especially with larger decks.
 That logic didn't seem to matter as much for individual hands.
-I also just create a new deck when the shoe is up. Seems faster
-and more logical.
+When the shoe is up I just reshuffle it in place rather than
+building a new one.
 
 Notes from last time:
 Dealer stands iff dealer is hard 17.
@@ -15,33 +15,86 @@ The arbitrary truecount for these simulations will be +2.
 """
 
 
+LABELS = (None, "A", "2", "3", "4", "5", "6", "7", "8", "9", "10")
+
+
 class shoe:
+    """
+    The cards are kept as int8 values with the ace as 1. Dealing moves a
+    cursor along the shuffled deck instead of deleting from it, so a card
+    costs the same no matter how big the shoe is.
+    """
     def __init__(self, size, deck = ["A",2,3,4,5,6,7,8,9,10,10,10,10],
                  decksets = 4):
         decksize = decksets * len(deck)
-        self.deck = np.array(deck * decksize * size)
+        deck = [1 if card == "A" else int(card) for card in deck]
+        self.deck = np.array(deck * decksize * size, dtype=np.int8)
+        self.shuffle()
+
+    def shuffle(self):
+        """
+        Reshuffle the whole shoe in place and start dealing from the top.
+        """
         #Marking when to use a new deck
-        self.yellowcard = np.random.randint(self.deck.size/2,
-                                            self.deck.size-30)
+        self.yellowcard = np.random.randint(self.deck.size // 2,
+                                            self.deck.size - 30)
         #Counter towards the yellowcard
         self.count = 0
         self.reset = False
         np.random.shuffle(self.deck)
 
     def show(self):
-        print(self.deck)
+        print([LABELS[card] for card in self.deck[self.count:]])
 
     def deal(self):
+        if self.count == self.deck.size:
+            self.shuffle()
+        todeal = self.deck[self.count]
         self.count += 1
         if self.count > self.yellowcard :
             self.reset = True
-        todeal = self.deck[0]
-        if not todeal == "A":
-            int(todeal)
-        self.deck = np.delete(self.deck,0)
+        return todeal
+
+    def deal_many(self, k):
+        """
+        Deal `k` cards at once. The result is a view on the shoe, so it is
+        only good until the next shuffle. `k` can't be more than the
+        number of cards in the shoe.
+        """
+        if k > self.deck.size:
+            raise ValueError("can't deal %d cards from a shoe of %d"
+                             % (k, self.deck.size))
+        if self.count + k > self.deck.size:
+            self.shuffle()
+        todeal = self.deck[self.count:self.count + k]
+        self.count += k
+        if self.count > self.yellowcard :
+            self.reset = True
         return todeal
 
 
+def _hand_tables():
+    """
+    A hand is kept as a single state, 2 * hard total + has ace, where the
+    hard total counts aces as 1 and any bust is 22. Returns the table of
+    state transitions for adding each card value and the best value of
+    each state.
+    """
+    add = np.zeros((2 * 23, 11), dtype=int)
+    value = np.zeros(2 * 23, dtype=int)
+    for hard in range(23):
+        for ace in (0, 1):
+            state = 2 * hard + ace
+            value[state] = hard + 10 if ace and hard <= 11 else hard
+            for card in range(1, 11):
+                add[state, card] = (2 * min(hard + card, 22) +
+                                    (ace or card == 1))
+    # lists are quicker than arrays for looking up one element at a time
+    return add.tolist(), value.tolist()
+
+HAND_ADD, HAND_VALUE = _hand_tables()
+
+
 class player:
     def __init__(self,
                  bank,
@@ -52,6 +105,7 @@ class player:
                  countaccuracy = 100
                  ):
         self.hand = []
+        self.state = 0
         self.bank = bank
         self.low = lowbet
         self.high = hibet
@@ -64,30 +118,17 @@ class player:
 
     def evalhand(self):
         """
-        This method might be a bit redundant
-        but it allows adjustment of hands to optimal
-        value. It is useful post deal.
+        The best value of the hand. Anything over 21 is a bust.
         """
-        if(not 11 in self.hand and not 1 in self.hand):
-            return sum(self.hand)
-        else:
-            while(sum(self.hand) > 21):
-                if(11 in self.hand):
-                    self.hand[self.hand.index(11)] = 1
-                else:
-                    break
-            return sum(self.hand)
+        return HAND_VALUE[self.state]
 
     def get(self,card):
-        if(card == "A" and sum(self.hand) <= 10):
-            self.hand.append(11)
-        elif(card == "A"):
-            self.hand.append(1)
-        else:
-            self.hand.append(int(card))
+        self.hand.append(card)
+        self.state = HAND_ADD[self.state][card]
 
     def reset(self):
         self.hand = []
+        self.state = 0
 
     def show(self):
         print(self.hand)
@@ -98,22 +139,15 @@ class player:
         cards, i.e. not factoring them into count.
         """
         if(np.random.randint(0,self.countaccuracy + 1)):
-            self.mycount += self.countsystem[card]
+            self.mycount += self.countsystem[LABELS[card]]
 
 class dealer:
     def __init__(self):
         self.hand = []
+        self.state = 0
 
     def evalhand(self):
-        if(not 11 in self.hand and not 1 in self.hand):
-            return sum(self.hand)
-        else:
-            while(sum(self.hand) > 21):
-                if(11 in self.hand):
-                    self.hand[self.hand.index(11)] = 1
-                else:
-                    break
-            return sum(self.hand)
+        return HAND_VALUE[self.state]
 
     def show(self):
         print(self.hand)
@@ -122,14 +156,11 @@ class dealer:
         return self.hand[0]
     def reset(self):
         self.hand = []
+        self.state = 0
 
     def get(self,card):
-        if(card == "A" and sum(self.hand) <= 10):
-            self.hand.append(11)
-        elif(card == "A"):
-            self.hand.append(1)
-        else:
-            self.hand.append(int(card))
+        self.hand.append(card)
+        self.state = HAND_ADD[self.state][card]
 
 #players = np.array([player(1000),player(1000)],dtype=object)
 #players[:].get(x.deal())
@@ -237,12 +268,12 @@ def runtest(num_players, iterations=1000, numdecks=1, initial_bank=1000,
         #Cleanup stage
         for seat in table:
             seat.done = False
-            seat.hand = []
+            seat.reset()
         if(tableshoe.reset):
-            tableshoe = shoe(numdecks)
+            tableshoe.shuffle()
             for seat in table:
                 seat.mycount = 0
-        tabledealer.hand = []
+        tabledealer.reset()
 
     return np.array([seat.bank for seat in table])
 
@@ -304,7 +335,5 @@ if __name__ == "__main__":
     #cumtime
         #is the cumulative time spent in this and all subfunctions (from invocation till exit). This figure is accurate even for recursive functions.
 
-    #NOTE: Rethink using string arrays
-
 
 
@@ -0,0 +1,134 @@
+"""
+The repeated drug dosage model of the week 4 lab, solved exactly.
+
+Between doses the drug is eliminated at a rate proportional to the amount
+in the system, so the amount decays exponentially and there is no need to
+take small time steps. Each dose is an event that adds its absorbed
+fraction, and the model only has to be stepped from one dose to the next.
+
+Every parameter can be an array with a value for each patient, so many
+patients or dosage regimens are simulated at once. Arrays of dose events
+have a row for each dose and a column for each patient.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+# ug/ml
+MIN_EFFECTIVE = 10
+MIN_TOXIC = 20
+
+# dose_times and peaks have shape (ndoses, npatients). peaks is the
+# concentration right after each dose, and elimination_constant has a
+# value for each patient.
+Course = namedtuple("Course", ["dose_times", "peaks", "elimination_constant"])
+
+
+def regular_doses(time_end, interval=8, dosage=100*1000, time_start=0):
+    """
+    The times and sizes of doses taken every `interval` hours from
+    `time_start` up to and including `time_end`.
+
+    The regimens can differ in the number of doses. Shorter ones are
+    padded with doses of size 0 at `time_end`.
+    """
+    interval, dosage, time_start = np.broadcast_arrays(
+            *np.atleast_1d(interval, dosage, time_start))
+    ndoses = int(np.floor((time_end - time_start) / interval).max()) + 1
+    times = time_start + np.arange(ndoses)[:, None] * interval
+    taken = times <= time_end
+    return np.where(taken, times, time_end), np.where(taken, dosage, 0)
+
+
+def simulate(dose_times, doses, half_life=22, absorption_fraction=.12,
+             plasma_volume=3000):
+    """
+    Work out the concentration after every dose.
+
+    Parameters
+    ----------
+    dose_times : array-like
+        The time of each dose in hours, in increasing order, with shape
+        (ndoses,) or (ndoses, npatients).
+    doses : array-like
+        The size of each dose in ug, with the same shape.
+    half_life : float or array-like
+        The half-life of the drug in hours.
+    absorption_fraction : float or array-like
+        The fraction of each dose that is absorbed.
+    plasma_volume : float or array-like
+        The volume of plasma in ml.
+
+    Returns
+    -------
+    course : Course
+    """
+    dose_times, doses, half_life, absorption_fraction, plasma_volume = [
+        np.asarray(arr, dtype=float) for arr in (dose_times, doses, half_life,
+                                                 absorption_fraction,
+                                                 plasma_volume)]
+    if dose_times.ndim == 1:
+        dose_times = dose_times[:, None]
+    if doses.ndim == 1:
+        doses = doses[:, None]
+    npatients = np.broadcast_shapes(dose_times.shape[1:], doses.shape[1:],
+                                    half_life.shape, absorption_fraction.shape,
+                                    plasma_volume.shape)
+    dose_times = np.broadcast_to(dose_times, dose_times.shape[:1] + npatients)
+    if np.any(np.diff(dose_times, axis=0) < 0):
+        raise ValueError("dose_times should be increasing")
+    k = np.broadcast_to(-np.log(.5) / half_life, npatients)
+
+    # the concentration each dose adds
+    peaks = np.broadcast_to(doses * absorption_fraction / plasma_volume,
+                            dose_times.shape).copy()
+    decay = np.exp(-k * np.diff(dose_times, axis=0))
+    for j in range(1, len(peaks)):
+        peaks[j] += peaks[j-1] * decay[j-1]
+    return Course(dose_times, peaks, k)
+
+
+def repeated_dosage(time_end=168, interval=8, dosage=100*1000, time_start=0,
+                    half_life=22, absorption_fraction=.12, plasma_volume=3000):
+    """
+    simulate for doses taken at regular intervals. The defaults are those
+    of the lab.
+    """
+    dose_times, doses = regular_doses(time_end, interval, dosage, time_start)
+    return simulate(dose_times, doses, half_life, absorption_fraction,
+                    plasma_volume)
+
+
+def concentration(course, times):
+    """
+    The concentration in ug/ml at `times`, with shape (ntimes, npatients).
+    """
+    times = np.asarray(times, dtype=float)[:, None]
+    conc = np.zeros((len(times), course.peaks.shape[1]))
+    k = course.elimination_constant
+    # each dose's peak decays until the next dose replaces it
+    for start, peak in zip(course.dose_times, course.peaks):
+        since = times - start
+        np.copyto(conc, peak * np.exp(-k * since), where=since >= 0)
+    return conc
+
+
+def time_in_window(course, time_end, low=MIN_EFFECTIVE, high=MIN_TOXIC):
+    """
+    The number of hours up to `time_end` that each patient's concentration
+    is between `low` and `high`.
+
+    The concentration falls steadily between doses, so the times it
+    crosses `high` and `low` after each dose are found exactly.
+    """
+    dose_times = course.dose_times
+    k = course.elimination_constant
+    ends = np.minimum(np.vstack((dose_times[1:],
+                                 np.broadcast_to(time_end, k.shape))),
+                      time_end)
+    length = np.maximum(ends - dose_times, 0)
+    with np.errstate(divide="ignore"):
+        # the times after the dose that it drops below high and below low
+        below_high = np.clip(np.log(course.peaks / high) / k, 0, length)
+        below_low = np.clip(np.log(course.peaks / low) / k, 0, length)
+    return (below_low - below_high).sum(0)
@@ -0,0 +1,283 @@
+"""
+The spreading of fire cellular automaton from the week 8 diffusion models
+notebook, with the whole lattice updated by array operations.
+
+The notebook applies `spread` to every site with ndimage.generic_filter.
+Here the burning neighbors of every site are found by shifting the
+lattice, the random numbers for a step are drawn in one call, and the
+new lattice is written into a second buffer that is swapped with the
+first, so a step doesn't allocate anything.
+
+A site is EMPTY, a TREE or BURNING. The boundaries are periodic, like
+mode="wrap" in the notebook.
+
+An ensemble of independent lattices is stacked into one 3d array and
+stepped at once. Members are dropped from the arrays as their fires go
+out, so finished runs cost nothing.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+EMPTY, TREE, BURNING = 0, 1, 2
+
+# burned is the fraction of the trees that burned down and
+# extinction_time the number of steps until nothing was burning
+Ensemble = namedtuple("Ensemble", ["burned", "extinction_time"])
+
+# the mean and standard error over the runs for each setting, with a row
+# for each prob_tree and a column for each prob_immune
+Percolation = namedtuple("Percolation", ["prob_tree", "prob_immune", "burned",
+                                         "burned_stderr", "extinction_time",
+                                         "extinction_time_stderr"])
+
+
+def init_grid(n, prob_tree, prob_burning, seed=None, nruns=None):
+    """
+    An n x n lattice where each site has a tree with probability
+    `prob_tree`, and each tree is burning with probability `prob_burning`.
+
+    If `nruns` is given, a stack of that many lattices is returned and the
+    probabilities can be arrays with one value for each.
+    """
+    rng = np.random.default_rng(seed)
+    if nruns is None:
+        shape = (n, n)
+    else:
+        shape = (nruns, n, n)
+        prob_tree = np.reshape(prob_tree, (-1, 1, 1))
+        prob_burning = np.reshape(prob_burning, (-1, 1, 1))
+    lattice = (rng.random(shape) < prob_tree).astype(np.int8)
+    lattice += lattice & (rng.random(shape) < prob_burning)
+    return lattice
+
+
+def burning_neighbors(burning, out=None):
+    """
+    Whether any of the von Neumann (N, S, E, W) neighbors of each site is
+    burning, with periodic boundaries.
+
+    Parameters
+    ----------
+    burning : ndarray
+        A boolean array of the burning sites. The lattice is made of the
+        last two axes.
+    out : ndarray, optional
+        A boolean array to write the result into. It can't be `burning`.
+    """
+    if out is None:
+        out = np.empty_like(burning)
+    # north and south
+    np.copyto(out[..., 1:, :], burning[..., :-1, :])
+    np.copyto(out[..., :1, :], burning[..., -1:, :])
+    out[..., :-1, :] |= burning[..., 1:, :]
+    out[..., -1:, :] |= burning[..., :1, :]
+    # west and east
+    out[..., 1:] |= burning[..., :-1]
+    out[..., :1] |= burning[..., -1:]
+    out[..., :-1] |= burning[..., 1:]
+    out[..., -1:] |= burning[..., :1]
+    return out
+
+
+class Fire(object):
+    """
+    A lattice on fire.
+
+    Parameters
+    ----------
+    grid : array-like
+        The initial lattice, e.g. from init_grid, or a stack of them. It is
+        copied.
+    prob_lightning : float or ndarray
+        The probability that lightning hits a site in a step. For a stack
+        of lattices, an array of shape (nruns, 1, 1) gives each its own.
+    prob_immune : float or ndarray
+        The probability that a tree doesn't catch fire from a burning
+        neighbor or from lightning.
+    seed : None, int, SeedSequence or Generator
+        Passed to np.random.default_rng.
+
+    Notes
+    -----
+    In the notebook a tree next to a fire that doesn't catch from it can
+    still be hit by lightning, so the probability that a tree catches fire
+    is (1 - prob_immune) * (1 + prob_immune * prob_lightning) next to a
+    fire and (1 - prob_immune) * prob_lightning otherwise. One uniform
+    draw per site is compared with the right one.
+    """
+    def __init__(self, grid, prob_lightning, prob_immune, seed=None):
+        self.grid = np.array(grid, dtype=np.int8)
+        self.prob_lightning = prob_lightning
+        self.prob_immune = prob_immune
+        self.rng = np.random.default_rng(seed)
+        self._allocate()
+
+    def _allocate(self):
+        shape = self.grid.shape
+        self._next = np.empty_like(self.grid)
+        self._sites = np.empty(shape, dtype=bool)
+        self._near_fire = np.empty(shape, dtype=bool)
+        self._catch = np.empty(shape, dtype=bool)
+        self._uniform = np.empty(shape)
+
+    def _keep(self, members):
+        """
+        Keep only the lattices of a stack picked out by `members`.
+        """
+        self.grid = self.grid[members]
+        if np.ndim(self.prob_lightning) == 3:
+            self.prob_lightning = self.prob_lightning[members]
+        if np.ndim(self.prob_immune) == 3:
+            self.prob_immune = self.prob_immune[members]
+        self._allocate()
+
+    def step(self):
+        """
+        Advance the lattice one step. Returns the new lattice, which is
+        overwritten by the step after next.
+        """
+        grid = self.grid
+        sites = self._sites
+        catch = self._catch
+        uniform = self._uniform
+
+        np.equal(grid, BURNING, out=sites)
+        burning_neighbors(sites, out=self._near_fire)
+
+        p_lightning = (1 - self.prob_immune) * self.prob_lightning
+        p_near_fire = (1 - self.prob_immune) * (1 + self.prob_immune *
+                                                self.prob_lightning)
+        # shift the draws next to a fire so that one threshold does for both
+        self.rng.random(out=uniform)
+        np.subtract(uniform, p_near_fire - p_lightning, out=uniform,
+                    where=self._near_fire)
+        np.less(uniform, p_lightning, out=catch)
+
+        # burning and empty sites become empty, trees stay or catch fire
+        np.equal(grid, TREE, out=sites)
+        catch &= sites
+        np.add(sites, catch, out=self._next, dtype=np.int8)
+
+        self.grid, self._next = self._next, grid
+        return self.grid
+
+    def burning(self):
+        """
+        Whether anything is still burning.
+        """
+        return (self.grid == BURNING).any()
+
+
+def simulate_fire(n, prob_tree, prob_burning, prob_lightning, prob_immune, t,
+                  seed=None):
+    """
+    Run the notebook's simulation for `t` steps.
+
+    Returns
+    -------
+    grids : ndarray
+        The lattice at each step, with shape (t + 1, n, n).
+    """
+    rng = np.random.default_rng(seed)
+    fire = Fire(init_grid(n, prob_tree, prob_burning, rng), prob_lightning,
+                prob_immune, rng)
+    grids = np.empty((t + 1, n, n), dtype=np.int8)
+    grids[0] = fire.grid
+    for i in range(1, t + 1):
+        grids[i] = fire.step()
+    return grids
+
+
+def run_ensemble(grids, prob_lightning, prob_immune, max_steps=None,
+                 seed=None):
+    """
+    Burn a stack of lattices until nothing is burning in each.
+
+    Parameters
+    ----------
+    grids : array-like
+        The initial lattices, with shape (nruns, n, n). See init_grid.
+    prob_lightning, prob_immune : float or array-like
+        The probabilities, the same for every run or one for each.
+    max_steps : int, optional
+        Stop runs that are still burning after this many steps. Needed if
+        prob_lightning is so high that the fires never go out.
+    seed : None, int, SeedSequence or Generator
+        Passed to np.random.default_rng.
+
+    Returns
+    -------
+    ensemble : Ensemble
+        The fraction of the trees that burned in each run and the number
+        of steps it took.
+    """
+    grids = np.asarray(grids, dtype=np.int8)
+    nruns = len(grids)
+    prob_lightning = np.broadcast_to(prob_lightning, (nruns,))[:, None, None]
+    prob_immune = np.broadcast_to(prob_immune, (nruns,))[:, None, None]
+    fire = Fire(grids, prob_lightning, prob_immune, seed)
+
+    trees = (grids != EMPTY).sum((1, 2))
+    burned = np.zeros(nruns)
+    extinction_time = np.zeros(nruns, dtype=int)
+    members = np.arange(nruns)
+    alive = (grids == BURNING).any((1, 2))
+    steps = 0
+    while True:
+        if steps == max_steps:
+            alive[:] = False
+        if not alive.all():
+            done = members[~alive]
+            left = (fire.grid[~alive] == TREE).sum((1, 2))
+            burned[done] = 1 - left / np.maximum(trees[done], 1)
+            extinction_time[done] = steps
+            members = members[alive]
+            if not len(members):
+                break
+            fire._keep(alive)
+        fire.step()
+        steps += 1
+        # the sites that caught fire are the ones burning now
+        alive = fire._catch.any((1, 2))
+    return Ensemble(burned, extinction_time)
+
+
+def percolation(n, prob_tree, prob_immune, nruns=100, prob_burning=.0005,
+                prob_lightning=0, max_steps=None, seed=None):
+    """
+    The fraction burned and the time until the fire goes out for every
+    combination of `prob_tree` and `prob_immune`, from `nruns` runs of
+    each, all stepped together.
+
+    Parameters
+    ----------
+    n : int
+        The size of the lattices.
+    prob_tree, prob_immune : array-like
+        The settings to try.
+    nruns : int
+        The number of runs of each setting.
+    prob_burning, prob_lightning, max_steps, seed
+        See init_grid and run_ensemble. With no lightning every fire
+        goes out.
+
+    Returns
+    -------
+    percolation : Percolation
+    """
+    prob_tree = np.atleast_1d(prob_tree)
+    prob_immune = np.atleast_1d(prob_immune)
+    shape = (len(prob_tree), len(prob_immune), nruns)
+    trees, immune, _ = np.meshgrid(prob_tree, prob_immune, np.arange(nruns),
+                                   indexing="ij")
+    rng = np.random.default_rng(seed)
+    grids = init_grid(n, trees.ravel(), prob_burning, rng, nruns=trees.size)
+    ensemble = run_ensemble(grids, prob_lightning, immune.ravel(), max_steps,
+                            rng)
+    burned = ensemble.burned.reshape(shape)
+    time = ensemble.extinction_time.reshape(shape)
+    root_n = np.sqrt(nruns)
+    return Percolation(prob_tree, prob_immune, burned.mean(2),
+                       burned.std(2, ddof=1) / root_n, time.mean(2),
+                       time.std(2, ddof=1) / root_n)
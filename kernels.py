@@ -0,0 +1,68 @@
+"""
+Numerically stable logistic and softmax functions.
+
+Each function evaluates exp once per element, never returns inf or nan
+for finite input, and takes an `out` argument so the result can be
+written into an existing array, including the input itself. sigmoid and
+log_sigmoid work entirely in the output array, so with `out` they don't
+allocate anything. float32 inputs give float32 results.
+"""
+import numpy as np
+
+
+def _empty_like_float(x):
+    return np.empty(x.shape, np.result_type(x.dtype, np.float16))
+
+
+def sigmoid(x, out=None):
+    """
+    The logistic function 1/(1 + exp(-x)).
+
+    For negative x, exp(-x) is large rather than small, but it only
+    overflows once the result is below the smallest normal number, and
+    then 1/(1 + inf) gives 0. Small probabilities otherwise keep their
+    precision instead of rounding to zero.
+    """
+    x = np.asarray(x)
+    result = _empty_like_float(x) if out is None else out
+    np.negative(x, out=result)
+    with np.errstate(over="ignore"):
+        np.exp(result, out=result)
+    result += 1
+    np.reciprocal(result, out=result)
+    return result[()] if out is None else result
+
+
+def log_sigmoid(x, out=None):
+    """
+    log(sigmoid(x)), computed as -log(exp(0) + exp(-x)) with np.logaddexp,
+    which is min(x, 0) - log(1 + exp(-|x|)).
+    """
+    x = np.asarray(x)
+    result = _empty_like_float(x) if out is None else out
+    np.negative(x, out=result)
+    np.logaddexp(0, result, out=result)
+    np.negative(result, out=result)
+    return result[()] if out is None else result
+
+
+def softmax(x, axis=-1, out=None):
+    """
+    exp(x) normalized to sum to one along `axis`. The maximum along
+    `axis` is subtracted first so exp can't overflow.
+    """
+    x = np.asarray(x)
+    out = np.subtract(x, x.max(axis=axis, keepdims=True), out=out)
+    np.exp(out, out=out)
+    out /= out.sum(axis=axis, keepdims=True)
+    return out
+
+
+def log_softmax(x, axis=-1, out=None):
+    """
+    log(softmax(x)), computed as x - max - log(sum(exp(x - max))).
+    """
+    x = np.asarray(x)
+    out = np.subtract(x, x.max(axis=axis, keepdims=True), out=out)
+    out -= np.log(np.exp(out).sum(axis=axis, keepdims=True))
+    return out
@@ -1,13 +1,232 @@
+import functools
+import itertools
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
+from scipy import linalg, sparse
+
+from kernels import sigmoid, log_sigmoid
+
+LogitResults = namedtuple("LogitResults", ["params", "loglike", "score", "cov",
+                                           "niter", "converged"])
+
+# X can also be a scipy.sparse matrix, which is only ever multiplied by
+# vectors, so the memory used scales with its nonzeros.
+
+def _asfloat(X):
+    if sparse.issparse(X):
+        return X.tocsr().astype(float, copy=False)
+    return np.asarray(X, dtype=float)
+
+def _dot(X, beta):
+    if sparse.issparse(X):
+        return X @ beta
+    return np.dot(X, beta)
+
+def _tdot(X, r):
+    # X' r
+    if sparse.issparse(X):
+        return X.T @ r
+    return np.dot(r, X)
+
+def _weighted_gram(X, w):
+    # X' diag(w) X
+    if sparse.issparse(X):
+        return (X.T @ X.multiply(w[:, None])).toarray()
+    return np.dot(X.T * w, X)
 
 def logit_func(x):
-    return np.exp(x)/(1+np.exp(x))
+    return sigmoid(x)
 
 def logit_loglikelihood(beta, y, X):
     q = 2*y - 1
-    return -np.sum(np.log(logit_func(q*np.dot(X,beta))))
+    return -np.sum(log_sigmoid(q*_dot(X,beta)))
 
 def logit_score(beta, y, X):
+    L = logit_func(_dot(X, beta))
+    return -_tdot(X, y - L)
+
+def logit_hessian(beta, y, X):
+    L = logit_func(_dot(X, beta))
+    return _weighted_gram(X, L * (1 - L))
+
+def logit_loglike_score_hessian(beta, y, X):
+    """
+    The negative log-likelihood, its gradient and its Hessian, all from
+    one product X . beta.
+    """
+    z = _dot(X, beta)
     q = 2*y - 1
-    L = logit_func(np.dot(X, beta))
-    return -np.dot(y - L, X)
+    loglike = -np.sum(log_sigmoid(q*z))
+    L = logit_func(z)
+    score = -_tdot(X, y - L)
+    L *= 1 - L
+    hessian = _weighted_gram(X, L)
+    return loglike, score, hessian
+
+def fit_logit(y, X, start_params=None, maxiter=35, tol=1e-8):
+    """
+    Fit a logit model by Newton's method (iteratively reweighted least
+    squares).
+
+    Parameters
+    ----------
+    y : array-like
+        The 0/1 outcomes.
+    X : array-like or sparse matrix
+        The regressors, including a constant if one is wanted.
+    start_params : array-like, optional
+        The starting values, e.g. the estimates from a fit on similar
+        data. Defaults to zeros.
+    maxiter : int
+        The maximum number of Newton steps.
+    tol : float
+        Stop once the predicted decrease in the negative log-likelihood,
+        score . H^-1 . score / 2, is below `tol`.
+
+    Returns
+    -------
+    results : LogitResults
+        The estimates, the negative log-likelihood and its gradient at
+        the estimates, the covariance of the estimates (the inverse
+        Hessian), the number of Newton steps and whether they converged.
+    """
+    y = np.asarray(y, dtype=float)
+    X = _asfloat(X)
+    if start_params is None:
+        start_params = np.zeros(X.shape[1])
+    return _newton(lambda beta: logit_loglike_score_hessian(beta, y, X),
+                   start_params, maxiter, tol)
+
+def _newton(evaluate, beta, maxiter, tol):
+    beta = np.array(beta, dtype=float)
+    loglike, score, hessian = evaluate(beta)
+    converged = False
+    for niter in range(1, maxiter+1):
+        factor = linalg.cho_factor(hessian)
+        step = linalg.cho_solve(factor, score)
+        decrement = .5 * np.dot(score, step)
+
+        # a full Newton step almost always works, halve it if it doesn't
+        t = 1.
+        while True:
+            new = beta - t * step
+            new_loglike, new_score, new_hessian = evaluate(new)
+            if new_loglike <= loglike or t < 1e-10:
+                break
+            t /= 2
+        beta, loglike, score, hessian = new, new_loglike, new_score, new_hessian
+
+        if decrement < tol:
+            converged = True
+            break
+
+    cov = linalg.cho_solve(linalg.cho_factor(hessian), np.eye(len(beta)))
+    return LogitResults(beta, loglike, score, cov, niter, converged)
+
+# Chunked data
+#
+# The log-likelihood, score and Hessian are sums over observations, so they
+# can be added up a block of rows at a time. A block is a (y, X) pair, or a
+# function of no arguments that loads one, which lets worker processes read
+# their own shard from disk instead of being sent the data.
+
+def iter_blocks(y, X, block_size=65536):
+    """
+    Yield (y, X) blocks of `block_size` rows. With np.memmap or
+    np.load(..., mmap_mode='r') arrays only one block is read into
+    memory at a time.
+    """
+    for start in range(0, X.shape[0], block_size):
+        yield y[start:start+block_size], X[start:start+block_size]
+
+def _load_rows(y_file, X_file, start, stop):
+    y = np.load(y_file, mmap_mode='r')
+    X = np.load(X_file, mmap_mode='r')
+    return y[start:stop], X[start:stop]
+
+def file_shards(y_file, X_file, nshards):
+    """
+    Split the rows of arrays saved with np.save into `nshards` blocks
+    that load themselves, for chunked_loglike_score_hessian and
+    fit_logit_chunked.
+    """
+    nobs = len(np.load(y_file, mmap_mode='r'))
+    bounds = np.linspace(0, nobs, nshards+1).astype(int)
+    return [functools.partial(_load_rows, y_file, X_file, start, stop)
+            for start, stop in zip(bounds[:-1], bounds[1:])]
+
+def _block_loglike_score_hessian(beta, block):
+    if callable(block):
+        block = block()
+    y, X = block
+    return logit_loglike_score_hessian(beta, np.asarray(y, dtype=float),
+                                       _asfloat(X))
+
+def chunked_loglike_score_hessian(beta, blocks, pool=None):
+    """
+    logit_loglike_score_hessian summed over blocks of rows.
+
+    Parameters
+    ----------
+    beta : array-like
+        The parameters.
+    blocks : iterable or callable
+        (y, X) pairs or functions that return them, e.g. from iter_blocks
+        or file_shards. If callable, it is called to get the blocks.
+    pool : concurrent.futures.Executor, optional
+        If given, the blocks are evaluated in the pool.
+    """
+    if callable(blocks):
+        blocks = blocks()
+    beta = np.asarray(beta, dtype=float)
+    if pool is None:
+        parts = (_block_loglike_score_hessian(beta, block) for block in blocks)
+    else:
+        parts = pool.map(_block_loglike_score_hessian, itertools.repeat(beta),
+                         blocks)
+    loglike = 0.
+    score = np.zeros(len(beta))
+    hessian = np.zeros((len(beta), len(beta)))
+    for part_loglike, part_score, part_hessian in parts:
+        loglike += part_loglike
+        score += part_score
+        hessian += part_hessian
+    return loglike, score, hessian
+
+def fit_logit_chunked(blocks, start_params, maxiter=35, tol=1e-8,
+                      max_workers=1):
+    """
+    fit_logit for data that doesn't fit in memory.
+
+    Every Newton step is one pass over the blocks.
+
+    Parameters
+    ----------
+    blocks : list or callable
+        The (y, X) blocks, or loaders for them, as for
+        chunked_loglike_score_hessian. They are needed once per step, so
+        an iterator raises TypeError. Pass a callable such as
+        lambda: iter_blocks(y, X) instead.
+    start_params : array-like
+        The starting values. Its length gives the number of parameters.
+    maxiter, tol
+        See fit_logit.
+    max_workers : int
+        If more than 1, each pass is spread over this many processes.
+        The blocks then have to be picklable, and loaders from
+        file_shards avoid sending the data itself.
+    """
+    if not callable(blocks) and iter(blocks) is blocks:
+        raise TypeError("blocks can't be an iterator, since they are needed "
+                        "once per Newton step. Pass a list or a callable "
+                        "such as lambda: iter_blocks(y, X)")
+    if max_workers == 1:
+        return _newton(lambda beta: chunked_loglike_score_hessian(beta,
+                                                                  blocks),
+                       start_params, maxiter, tol)
+    with ProcessPoolExecutor(max_workers) as pool:
+        return _newton(lambda beta: chunked_loglike_score_hessian(beta, blocks,
+                                                                  pool),
+                       start_params, maxiter, tol)
@@ -0,0 +1,270 @@
+# The Multi-Layer Perceptron from the week 12 notebook
+# Adapted from the code of Stephen Marsland
+# http://www-ist.massey.ac.nz/smarsland/Code/4/mlp.py
+import numpy as np
+
+from kernels import sigmoid, softmax
+from perceptron import Perceptron, weighted_sum
+
+# The functions below all work in place on their first argument so that
+# the training loop doesn't allocate new arrays on every iteration.
+
+def _linear_delta(deltao, outputs, nobs):
+    deltao /= nobs
+
+def _logistic_delta(deltao, outputs, nobs):
+    deltao *= outputs
+
+def _softmax_delta(deltao, outputs, nobs):
+    deltao /= nobs
+
+_calc_deltao = {
+        "linear" : _linear_delta,
+        "logistic" : _logistic_delta,
+        "softmax" : _softmax_delta
+        }
+
+def _linear_activation(outputs, beta):
+    pass
+
+def _logistic_activation(outputs, beta):
+    if beta != 1:
+        outputs *= beta
+    sigmoid(outputs, out=outputs)
+
+def _softmax_activation(outputs, beta):
+    # this is multinomial logit
+    softmax(outputs, axis=1, out=outputs)
+
+_activation_funcs = {
+        "linear" : _linear_activation,
+        "logistic" : _logistic_activation,
+        "softmax" : _softmax_activation,
+        }
+
+
+class MLP(Perceptron):
+    """
+    A Multi-Layer Perceptron
+
+    Parameters
+    ----------
+    nhidden : int
+        The number of neurons in the hidden layer.
+    eta : float
+        The learning rate of the network.
+    beta : float
+        The slope of the logistic activation function.
+    momentum : float
+        The fraction of the last update added to the current one.
+    outtype : str
+        The output neurons, 'linear', 'logistic' or 'softmax'.
+    dtype : dtype
+        The floating point type used for the weights and for training.
+        np.float32 halves the memory used and is often faster.
+    """
+    def __init__(self, nhidden, eta, beta=1, momentum=0.9, outtype='logistic',
+                 dtype=np.float64):
+        # Set up network size
+        self.nhidden = nhidden
+        self.eta = eta
+
+        self.beta = beta
+        self.momentum = momentum
+        self.outtype = outtype
+        self.dtype = np.dtype(dtype)
+
+    def _init_weights(self):
+        # Initialise network
+        weights1 = np.random.rand(self.m+1, self.nhidden)-0.5
+        weights1 *= 2/np.sqrt(self.m)
+        weights2 = np.random.rand(self.nhidden+1,self.n)-0.5
+        weights2 *= 2/np.sqrt(self.nhidden)
+
+        self.weights1 = weights1.astype(self.dtype)
+        self.weights2 = weights2.astype(self.dtype)
+
+    def earlystopping(self, inputs, targets, valid_input, valid_target,
+                            max_iter=100, epsilon=1e-3, disp=True):
+        """
+        Train the network in rounds of `max_iter` iterations until the
+        error on the validation set stops going down.
+
+        Returns the final validation error.
+        """
+        self._initialize(inputs, targets)
+        valid_target = np.asarray(valid_target)
+        if valid_target.ndim == 1:
+            valid_target = valid_target[:, None]
+
+        # current iteration, last iteration, 2 iterations ago
+        last_errors = [0, np.inf, np.inf]
+
+        count = 0
+
+        while np.any(np.diff(last_errors) > epsilon):
+            count += 1
+            if disp:
+                print(count)
+
+            # train the network
+            self.fit(inputs, targets, max_iter, init=False, disp=disp)
+            last_errors[2] = last_errors[1]
+            last_errors[1] = last_errors[0]
+
+            # check on the validation set
+            valid_output = self.predict(valid_input)
+            errors = valid_target - valid_output
+            last_errors[0] = 0.5*np.sum(errors**2)
+
+        if disp:
+            print("Stopped in %d iterations" % count, last_errors)
+        return last_errors[0]
+
+    def fit(self, inputs, targets, max_iter, disp=True, init=True):
+        """
+        Train the network
+
+        All of the intermediate arrays are allocated once before the first
+        iteration and written into with `out=` arguments after that.
+
+        Parameters
+        ----------
+        inputs : array-like
+            The inputs data
+        targets : array-like
+            The targets to train on
+        max_iter : int
+            The number of iterations to perform
+        disp : bool
+            Whether to print the objective at the end.
+        init : bool
+            Whether to initialize the weights or not.
+        """
+        if init:
+            self._initialize(inputs, targets)
+        dtype = self.dtype
+        inputs = np.asarray(self.inputs, dtype=dtype)
+        targets = np.asarray(self.targets, dtype=dtype)
+        weights1 = self.weights1
+        weights2 = self.weights2
+        eta = self.eta
+        beta = self.beta
+        momentum = self.momentum
+        nobs = self.nobs
+        nhidden = self.nhidden
+
+        outtype = self.outtype
+        calc_deltao = _calc_deltao[outtype]
+        activation = _activation_funcs[outtype]
+
+        # Work arrays reused by every iteration. The bias nodes are handled
+        # by weighted_sum and by the last rows of the updates.
+        hidden = np.empty((nobs, nhidden), dtype=dtype)
+        outputs = np.empty((nobs, self.n), dtype=dtype)
+        deltao = np.empty_like(outputs)
+        deltah = np.empty_like(hidden)
+        slope = np.empty_like(hidden)
+        grad1 = np.empty_like(weights1)
+        grad2 = np.empty_like(weights2)
+        updatew1 = np.zeros_like(weights1)
+        updatew2 = np.zeros_like(weights2)
+
+        for n in range(1, max_iter+1):
+
+            # Forwards phase
+            weighted_sum(inputs, weights1, out=hidden)
+            _logistic_activation(hidden, beta)
+            weighted_sum(hidden, weights2, out=outputs)
+            activation(outputs, beta)
+
+            # Different types of output neurons
+            np.subtract(targets, outputs, out=deltao)
+            if n == max_iter:
+                obj = .5 * np.dot(deltao.ravel(), deltao.ravel())
+            calc_deltao(deltao, outputs, nobs)
+
+            # deltah = hidden * (1 - hidden) * deltao . weights2.T
+            np.dot(deltao, weights2[:-1].T, out=deltah)
+            deltah *= hidden
+            np.subtract(1, hidden, out=slope)
+            deltah *= slope
+
+            # the bias nodes' inputs are -1
+            np.dot(inputs.T, deltah, out=grad1[:-1])
+            np.sum(deltah, axis=0, out=grad1[-1])
+            np.negative(grad1[-1], out=grad1[-1])
+            np.dot(hidden.T, deltao, out=grad2[:-1])
+            np.sum(deltao, axis=0, out=grad2[-1])
+            np.negative(grad2[-1], out=grad2[-1])
+
+            # update = eta * grad + momentum * last update
+            updatew1 *= momentum
+            grad1 *= eta
+            updatew1 += grad1
+            updatew2 *= momentum
+            grad2 *= eta
+            updatew2 += grad2
+            weights1 += updatew1
+            weights2 += updatew2
+
+        if disp and max_iter:
+            print("Iteration: ", n, " Objective: ", obj)
+
+        # attach results
+        self.weights1 = weights1
+        self.weights2 = weights2
+        self.hidden = hidden
+        self.outputs = outputs
+
+    def predict(self, inputs=None, add_bias=True):
+        """
+        Run the network forward.
+
+        The hidden layer's activations are attached as `hidden`.
+        """
+        if inputs is None:
+            inputs = self.inputs
+        inputs = np.asarray(inputs)
+
+        if add_bias:
+            hidden = weighted_sum(inputs, self.weights1)
+        else:
+            hidden = np.dot(inputs, self.weights1)
+        _logistic_activation(hidden, self.beta)
+        self.hidden = hidden
+
+        outputs = weighted_sum(hidden, self.weights2)
+
+        # Different types of output neurons
+        _activation_funcs[self.outtype](outputs, self.beta)
+        return outputs
+
+    def confusion_matrix(self, inputs, targets, summary=True):
+        """
+        Confusion matrix.
+        """
+        targets = np.asarray(targets)
+
+        outputs = self.predict(inputs)
+
+        n_classes = targets.ndim == 1 and 1 or targets.shape[1]
+
+        if n_classes==1:
+            n_classes = 2
+            # 50% cut-off with continuous activation function
+            outputs = np.where(outputs > 0.5, 1, 0)
+        else:
+            # 1-of-N encoding
+            outputs = np.argmax(outputs, 1)
+            targets = np.argmax(targets, 1)
+
+        outputs = np.squeeze(outputs)
+        targets = np.squeeze(targets)
+
+        cm = np.histogram2d(targets, outputs, bins=n_classes)[0]
+
+        if not summary:
+            return cm
+        else:
+            return np.trace(cm)/np.sum(cm)*100
@@ -0,0 +1,126 @@
+"""
+Train many network configurations at once and keep the best one.
+
+The training and validation arrays are copied once into shared memory and
+every worker process maps them, so the data is not pickled for each task.
+Each configuration is a dict of arguments for the model's constructor plus
+an optional "seed" for the random initial weights, so random restarts are
+just configurations that differ only in their seed.
+"""
+import inspect
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# the shared arrays as seen from inside a worker process
+_shared = {}
+
+
+def grid(**values):
+    """
+    All combinations of the given lists of values, as a list of dicts.
+
+    For example, grid(eta=[.1, .25], nhidden=[3, 5], seed=range(10)).
+    """
+    names = sorted(values)
+    return [dict(zip(names, combo))
+            for combo in itertools.product(*[values[name] for name in names])]
+
+
+def _share(arrays):
+    blocks, specs = [], {}
+    for name, arr in arrays.items():
+        arr = np.ascontiguousarray(arr, dtype=float)
+        block = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, arr.dtype, buffer=block.buf)[...] = arr
+        blocks.append(block)
+        specs[name] = (block.name, arr.shape, arr.dtype.str)
+    return blocks, specs
+
+
+def _attach(specs):
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        # keep a reference to the block so the buffer stays mapped
+        _shared[name] = (block, np.ndarray(shape, dtype, buffer=block.buf))
+
+
+def _train(model, config, max_iter, early_stopping):
+    inputs, targets, valid_inputs, valid_targets = [
+        _shared[name][1] for name in ("inputs", "targets", "valid_inputs",
+                                      "valid_targets")]
+    config = dict(config)
+    np.random.seed(config.pop("seed", None))
+    start = time.time()
+    net = model(**config)
+    if early_stopping:
+        net.earlystopping(inputs, targets, valid_inputs, valid_targets,
+                          max_iter=max_iter, disp=False)
+    elif "disp" in inspect.signature(net.fit).parameters:
+        net.fit(inputs, targets, max_iter, disp=False)
+    else:
+        net.fit(inputs, targets, max_iter)
+    outputs = net.predict(valid_inputs)
+    if valid_targets.ndim == 1:
+        outputs = np.squeeze(outputs)
+    error = 0.5 * np.sum((valid_targets - outputs)**2)
+    # don't send the training data or its activations back
+    for name in ("inputs", "targets", "hidden", "outputs"):
+        net.__dict__.pop(name, None)
+    return net, error, time.time() - start
+
+
+def search(model, configs, inputs, targets, valid_inputs, valid_targets,
+           max_iter=100, early_stopping=False, max_workers=None):
+    """
+    Train every configuration over a pool of processes.
+
+    Parameters
+    ----------
+    model : class
+        The network class, e.g. perceptron.Perceptron or mlp.MLP.
+    configs : list of dict
+        Arguments for `model`, plus an optional "seed" used to seed NumPy
+        before the weights are initialized. See grid.
+    inputs, targets : array-like
+        The training data.
+    valid_inputs, valid_targets : array-like
+        The validation data used to rank the configurations.
+    max_iter : int
+        Passed to the model's fit or earlystopping method.
+    early_stopping : bool
+        If True, train with the model's earlystopping method.
+    max_workers : int, optional
+        The number of processes. Defaults to the number of CPUs.
+
+    Returns
+    -------
+    best : object
+        The fitted network with the smallest validation error.
+    results : list of dict
+        The configuration, validation error (half the sum of squares) and
+        wall time in seconds of each configuration, in the order given.
+    """
+    arrays = {"inputs": inputs, "targets": targets,
+              "valid_inputs": valid_inputs, "valid_targets": valid_targets}
+    blocks, specs = _share(arrays)
+    try:
+        with ProcessPoolExecutor(max_workers or os.cpu_count(),
+                                 initializer=_attach,
+                                 initargs=(specs,)) as pool:
+            futures = [pool.submit(_train, model, config, max_iter,
+                                   early_stopping) for config in configs]
+            fitted = [future.result() for future in futures]
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    results = [{"config": config, "error": error, "time": seconds}
+               for config, (net, error, seconds) in zip(configs, fitted)]
+    best = min(range(len(fitted)), key=lambda i: fitted[i][1])
+    return fitted[best][0], results
@@ -0,0 +1,136 @@
+"""
+Monte Carlo integration that runs until it is accurate enough.
+
+This generalizes `calc_area` from the week 7 rejection sampling lab.
+Instead of repeating a fixed number of runs of a fixed number of darts,
+samples are drawn a block at a time into the same buffer, and the running
+mean and variance of the estimates are updated after each block. The
+integration stops as soon as the standard error of the mean reaches the
+requested tolerance, so the memory used is one block whatever the number
+of samples.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+Integral = namedtuple("Integral", ["value", "stderr", "n", "converged"])
+
+
+class RunningStats(object):
+    """
+    The running mean and variance of a stream of numbers.
+
+    Blocks of numbers are merged in with the pairwise form of Welford's
+    update (Chan, Golub and LeVeque), which doesn't lose precision the way
+    keeping sums of squares does.
+    """
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.
+        self.m2 = 0.
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float).ravel()
+        nblock = len(values)
+        if not nblock:
+            return
+        block_mean = values.mean()
+        block_m2 = np.dot(values - block_mean, values - block_mean)
+        n = self.n + nblock
+        delta = block_mean - self.mean
+        self.mean += delta * nblock / n
+        self.m2 += block_m2 + delta**2 * self.n * nblock / n
+        self.n = n
+
+    @property
+    def variance(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else np.nan
+
+    @property
+    def stderr(self):
+        return np.sqrt(self.variance / self.n) if self.n > 1 else np.inf
+
+
+def integrate(func, bounds, ybounds=None, stderr=1e-3, block_size=2**16,
+              min_samples=2**10, max_samples=10**9, seed=None):
+    """
+    Integrate `func` over a box by Monte Carlo.
+
+    Parameters
+    ----------
+    func : callable
+        The integrand. For one dimension it is called with an array of
+        x values. For more it is called with an array of shape
+        (ndim, nsamples), so func(points) can start with x, y = points.
+    bounds : sequence
+        (low, high) for one dimension or a list of them, one for each.
+    ybounds : sequence, optional
+        If given, integrate by throwing darts at the box bounds x ybounds
+        and counting those under the curve, as calc_area does. Otherwise
+        average func over the box and multiply by its volume, which has a
+        smaller variance.
+    stderr : float
+        Stop when the standard error of the estimate is at most this.
+    block_size : int
+        The number of samples drawn at a time. Small enough blocks stay
+        in the cache.
+    min_samples : int
+        Don't stop before this many samples, so the variance estimate can
+        be trusted.
+    max_samples : int
+        Stop after this many samples even if `stderr` isn't reached.
+    seed : None, int, SeedSequence or Generator
+        Passed to np.random.default_rng.
+
+    Returns
+    -------
+    integral : Integral
+        The estimate, its standard error, the number of samples and
+        whether the standard error reached `stderr`.
+    """
+    rng = np.random.default_rng(seed)
+    bounds = np.asarray(bounds, dtype=float)
+    one_dim = bounds.ndim == 1
+    bounds = bounds.reshape(-1, 2)
+    low = bounds[:, :1]
+    width = bounds[:, 1:] - low
+    volume = width.prod()
+    if ybounds is not None:
+        ylow, yhigh = ybounds
+        volume *= yhigh - ylow
+
+    ndim = len(bounds)
+    # (sample, dimension), so that the first rows of a short last block
+    # are still contiguous
+    points = np.empty((block_size, ndim))
+    heights = np.empty(block_size)
+    stats = RunningStats()
+    while stats.n < max_samples:
+        size = min(block_size, max_samples - stats.n)
+        rng.random(out=points[:size])
+        x = points[:size].T
+        x *= width
+        x += low
+        values = np.asarray(func(x[0] if one_dim else x), dtype=float)
+        if ybounds is None:
+            values = values * volume
+        else:
+            y = heights[:size]
+            rng.random(out=y)
+            y *= yhigh - ylow
+            y += ylow
+            values = (y < values) * volume
+        stats.update(values)
+        if stats.n >= min_samples and stats.stderr <= stderr:
+            break
+    return Integral(stats.mean, stats.stderr, stats.n,
+                    bool(stats.stderr <= stderr))
+
+
+def calc_area(true_func, xbounds, ybounds, num_darts, seed=None):
+    """
+    The lab's dart throwing estimate of the area under `true_func` from
+    `num_darts` darts.
+    """
+    return integrate(true_func, xbounds, ybounds, stderr=0,
+                     max_samples=num_darts, seed=seed).value
@@ -0,0 +1,270 @@
+"""
+Euler and Runge-Kutta integrators for a batch of systems at once.
+
+These generalize the `euler` and `runge_kutta4` functions of the week 6
+solution notebooks to a vector state and to many parameter sets. The
+right-hand side has the odeint signature func(y, t, *args) and is called
+once per stage for the whole batch. y has shape (nstate, nbatch), so a
+model written for one system, like the shark model's
+
+    def dpop_dt(pops, t, wts_birth_frac, bts_birth_frac, wts_death_prop,
+                bts_death_prop):
+        bts, wts = pops
+        ...
+        return [bts_change, wts_change]
+
+works unchanged when its parameters are arrays with one value per system:
+
+    params = np.random.uniform(.1, 1, size=(4, 10000))
+    pops = runge_kutta4(dpop_dt, [15, 20], 5, .1, args=tuple(params))
+
+The solution is written into a preallocated array of shape
+(nsteps + 1, nbatch, nstate), with the initial values in the first row.
+"""
+import numpy as np
+
+
+def time_points(ntime, dt):
+    """
+    The times the solution is given at.
+    """
+    return np.arange(int(ntime/dt) + 1) * dt
+
+
+def _setup(initial, nsteps, args, out):
+    initial = np.atleast_1d(np.asarray(initial, dtype=float))
+    nstate = initial.shape[-1]
+    batch = np.broadcast_shapes(initial.shape[:-1],
+                                *(np.shape(arg) for arg in args))
+    if len(batch) > 1:
+        raise ValueError("the parameters should be scalars or 1d arrays")
+    nbatch = batch[0] if batch else 1
+    if out is None:
+        out = np.empty((nsteps + 1, nbatch, nstate))
+    elif out.shape != (nsteps + 1, nbatch, nstate):
+        raise ValueError("out should have shape %s" %
+                         ((nsteps + 1, nbatch, nstate),))
+    out[0] = initial
+    return out
+
+
+def _rhs(func, y, t, args):
+    return np.asarray(func(y, t, *args), dtype=float)
+
+
+def euler(func, initial, ntime, dt, args=(), out=None):
+    """
+    Integrate with Euler's method.
+
+    Parameters
+    ----------
+    func : callable
+        func(y, t, *args) returns dy/dt. y has shape (nstate, nbatch).
+    initial : array-like
+        The initial state, with shape (nstate,) or (nbatch, nstate).
+    ntime : float
+        The length of time to integrate over.
+    dt : float
+        The step size.
+    args : tuple
+        Extra arguments for `func`, each a scalar or an array with a value
+        for each system in the batch.
+    out : ndarray, optional
+        Where to write the solution.
+
+    Returns
+    -------
+    out : ndarray
+        The solution at time_points(ntime, dt), with shape
+        (nsteps + 1, nbatch, nstate).
+    """
+    out = _setup(initial, int(ntime/dt), args, out)
+    for i in range(1, len(out)):
+        y = out[i-1].T
+        step = out[i].T
+        # the notebook evaluates the derivative at the end of the step
+        np.multiply(_rhs(func, y, i * dt, args), dt, out=step)
+        step += y
+    return out
+
+
+def runge_kutta4(func, initial, ntime, dt, args=(), out=None):
+    """
+    Integrate with the classical fourth order Runge-Kutta method.
+
+    The arguments are those of euler.
+    """
+    out = _setup(initial, int(ntime/dt), args, out)
+    tmp = np.empty_like(out[0].T)
+    # func may return its argument or a view of it, so each stage is
+    # copied into its own buffer before tmp is overwritten
+    d1, d2, d3, d4 = np.empty((4,) + tmp.shape)
+    for i in range(1, len(out)):
+        t1 = (i - 1) * dt
+        y = out[i-1].T
+        step = out[i].T
+        np.copyto(d1, _rhs(func, y, t1, args))
+        np.multiply(d1, .5*dt, out=tmp)
+        tmp += y
+        np.copyto(d2, _rhs(func, tmp, t1 + .5*dt, args))
+        np.multiply(d2, .5*dt, out=tmp)
+        tmp += y
+        np.copyto(d3, _rhs(func, tmp, t1 + .5*dt, args))
+        np.multiply(d3, dt, out=tmp)
+        tmp += y
+        np.copyto(d4, _rhs(func, tmp, t1 + dt, args))
+        # y + dt*(d1 + 2*d2 + 2*d3 + d4)/6
+        np.add(d2, d3, out=step)
+        step *= 2
+        step += d1
+        step += d4
+        step *= dt/6.
+        step += y
+    return out
+
+
+# Dormand-Prince coefficients, from Hairer, Norsett and Wanner, "Solving
+# Ordinary Differential Equations I", and the dense output polynomial of
+# Shampine, "Some Practical Runge-Kutta Formulas", 1986.
+_DP_C = np.array([0, 1/5., 3/10., 4/5., 8/9., 1])
+_DP_A = [
+    [],
+    [1/5.],
+    [3/40., 9/40.],
+    [44/45., -56/15., 32/9.],
+    [19372/6561., -25360/2187., 64448/6561., -212/729.],
+    [9017/3168., -355/33., 46732/5247., 49/176., -5103/18656.],
+]
+_DP_B = np.array([35/384., 0, 500/1113., 125/192., -2187/6784., 11/84.])
+# the fifth order solution minus the embedded fourth order one
+_DP_E = np.array([-71/57600., 0, 71/16695., -71/1920., 17253/339200.,
+                  -22/525., 1/40.])
+_DP_P = np.array([
+    [1, -8048581381/2820520608., 8663915743/2820520608.,
+     -12715105075/11282082432.],
+    [0, 0, 0, 0],
+    [0, 131558114200/32700410799., -68118460800/10900136933.,
+     87487479700/32700410799.],
+    [0, -1754552775/470086768., 14199869525/1410260304.,
+     -10690763975/1880347072.],
+    [0, 127303824393/49829197408., -318862633887/49829197408.,
+     701980252875/199316789632.],
+    [0, -282668133/205662961., 2019193451/616988883.,
+     -1453857185/822651844.],
+    [0, 40617522/29380423., -110615467/29380423., 69997945/29380423.]])
+
+
+def _error_norm(err, y, y_new, rtol, atol):
+    # the RMS of the scaled error of each system, worst system first
+    scale = np.maximum(np.abs(y), np.abs(y_new))
+    scale *= rtol
+    scale += atol
+    return np.sqrt(np.mean((err / scale)**2, axis=0)).max()
+
+
+def dormand_prince(func, initial, times, args=(), rtol=1e-6, atol=1e-8,
+                   first_step=None, max_step=np.inf, out=None):
+    """
+    Integrate with the adaptive Dormand-Prince 5(4) Runge-Kutta method.
+
+    The step size is chosen so the estimated local error of every system
+    in the batch stays within the tolerances. The last stage of a step
+    is the first stage of the next one, so a step costs six evaluations
+    of `func`. The solution at `times` is interpolated from the steps
+    with a fourth order polynomial, so the steps don't have to land on
+    them.
+
+    Parameters
+    ----------
+    func : callable
+        func(y, t, *args) returns dy/dt. y has shape (nstate, nbatch).
+    initial : array-like
+        The state at times[0], with shape (nstate,) or (nbatch, nstate).
+    times : array-like
+        The increasing times to give the solution at.
+    args : tuple
+        Extra arguments for `func`, each a scalar or an array with a value
+        for each system in the batch.
+    rtol, atol : float
+        The relative and absolute tolerances on the local error.
+    first_step : float, optional
+        The size of the first step. By default it is estimated from the
+        derivatives at the start.
+    max_step : float
+        The largest step allowed.
+    out : ndarray, optional
+        Where to write the solution.
+
+    Returns
+    -------
+    out : ndarray
+        The solution at `times`, with shape (ntimes, nbatch, nstate).
+    """
+    times = np.asarray(times, dtype=float)
+    if np.any(np.diff(times) <= 0):
+        raise ValueError("times should be increasing")
+    t0, tend = times[0], times[-1]
+    out = _setup(initial, len(times) - 1, args, out)
+    y = out[0].T.copy()
+
+    K = np.empty((7,) + y.shape)
+    K[0] = _rhs(func, y, t0, args)
+    if first_step is None:
+        # Hairer's rule: a step that changes y by about rtol relative to
+        # the scale of y and of its derivative
+        scale = atol + np.abs(y) * rtol
+        d0 = np.sqrt(np.mean((y / scale)**2))
+        d1 = np.sqrt(np.mean((K[0] / scale)**2))
+        if d0 < 1e-5 or d1 < 1e-5:
+            first_step = 1e-6
+        else:
+            first_step = .01 * d0 / d1
+    h = min(first_step, max_step, tend - t0)
+
+    t = t0
+    stage = np.empty_like(y)
+    y_new = np.empty_like(y)
+    err = np.empty_like(y)
+    nout = 1
+    while nout < len(times):
+        last = h >= tend - t
+        if last:
+            h = tend - t
+        for i in range(1, 6):
+            np.copyto(stage, y)
+            for j, a in enumerate(_DP_A[i]):
+                stage += h * a * K[j]
+            K[i] = _rhs(func, stage, t + _DP_C[i] * h, args)
+        np.copyto(y_new, y)
+        for j, b in enumerate(_DP_B):
+            if b:
+                y_new += h * b * K[j]
+        K[6] = _rhs(func, y_new, t + h, args)
+        np.dot(_DP_E, K.reshape(7, -1), out=err.reshape(-1))
+        err *= h
+        error = _error_norm(err, y, y_new, rtol, atol)
+
+        if not error <= 1:
+            if not np.isfinite(error) and h < 1e-14 * max(1, abs(t)):
+                raise FloatingPointError("the solution isn't finite at t=%g"
+                                         % t)
+            h *= max(.2, .9 * error**-.2) if np.isfinite(error) else .2
+            continue
+
+        # interpolate at the requested times within this step
+        t_new = tend if last else t + h
+        stop = np.searchsorted(times, t_new, side="right")
+        if stop > nout:
+            x = (times[nout:stop] - t) / h
+            Q = np.dot(K.reshape(7, -1).T, _DP_P)
+            powers = np.cumprod(np.repeat(x[:, None], 4, axis=1), axis=1)
+            dense = y.reshape(-1) + h * np.dot(powers, Q.T)
+            out[nout:stop] = dense.reshape((-1,) + y.shape).transpose(0, 2, 1)
+            nout = stop
+
+        t = t_new
+        y, y_new = y_new, y
+        K[0] = K[6]
+        h *= min(10, .9 * error**-.2) if error > 0 else 10
+        h = min(h, max_step)
+    return out
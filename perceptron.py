@@ -1,11 +1,61 @@
 # Adapted from the code of Stephen Marsland
 # http://www-ist.massey.ac.nz/smarsland/Code/2/pcn.py
 import numpy as np
+from scipy import sparse
+
+# The inputs can also be a scipy.sparse matrix. It is kept in CSR format
+# and only multiplied by the weights and errors, never made dense.
+
+def _asarray(inputs):
+    if sparse.issparse(inputs):
+        return inputs.tocsr()
+    return np.asarray(inputs)
 
 def add_bias_node(inputs):
-    bias_node = -np.ones(len(inputs))
+    nobs = inputs.shape[0] if sparse.issparse(inputs) else len(inputs)
+    bias_node = -np.ones((nobs, 1))
+    if sparse.issparse(inputs):
+        return sparse.hstack((inputs, bias_node), format="csr")
     return np.column_stack((inputs, bias_node))
 
+def weighted_sum(inputs, weights, out=None):
+    """
+    The network's inputs times the weights plus the bias node.
+
+    The last row of `weights` belongs to the bias node, whose input is
+    always -1, so it is subtracted rather than appending a column of -1s
+    to a copy of `inputs`.
+    """
+    if sparse.issparse(inputs):
+        if out is None:
+            out = inputs @ weights[:-1]
+        else:
+            out[...] = inputs @ weights[:-1]
+    else:
+        out = np.dot(inputs, weights[:-1], out=out)
+    out -= weights[-1]
+    return out
+
+def _input_dot(inputs, error, out=None):
+    """
+    inputs.T . error, the part of the update for the non-bias weights.
+    """
+    if not sparse.issparse(inputs):
+        return np.dot(inputs.T, error, out=out)
+    if out is None:
+        return inputs.T @ error
+    out[...] = inputs.T @ error
+    return out
+
+def iter_chunks(inputs, targets, chunksize=65536):
+    """
+    Yield (inputs, targets) blocks of `chunksize` rows. The blocks are
+    views, so for an np.memmap only the rows in use are read from disk.
+    """
+    for start in range(0, inputs.shape[0], chunksize):
+        yield (inputs[start:start + chunksize],
+               targets[start:start + chunksize])
+
 class Perceptron(object):
     """
     A basic Perceptron
@@ -21,7 +71,7 @@ class Perceptron(object):
         self.eta = eta
 
     def _initialize(self, inputs, targets):
-        inputs = np.asarray(inputs)
+        inputs = _asarray(inputs)
         # gets set to 2d in _add_bias_node
 
         targets = np.asarray(targets)
@@ -46,43 +96,166 @@ class Perceptron(object):
     def _init_weights(self):
         self.weights = np.random.rand(self.m+1, self.n)*0.1-0.05
 
-    def fit(self, inputs, targets, max_iter):
+    def fit(self, inputs, targets, max_iter, batch_size=None, shuffle=True,
+            early_stop=False):
         """
         Trains the network.
 
         Parameters
         ----------
-        inputs : array-like
+        inputs : array-like or sparse matrix
             The inputs data
         targets : array-like
             The targets to train on
         max_iter : int
-            The number of iterations to perform
+            The number of passes through the data to perform
+        batch_size : int, optional
+            The number of observations used for each weight update. The
+            default is to use all of them.
+        shuffle : bool
+            If True, visit the observations in a new random order on each
+            pass. Only an index is permuted, the data is not copied.
+        early_stop : bool
+            If True, stop after the first pass that makes no mistakes.
         """
         self._initialize(inputs, targets)
-        inputs = self.inputs
-        targets = self.targets
+        targets = np.asarray(self.targets, dtype=float)
         weights = self.weights
         eta = self.eta
+        nobs = self.nobs
+        inputs = self.inputs
 
-        # Add the inputs that match the bias node
-        inputs = add_bias_node(inputs)
-        # Training
-        change = range(self.nobs)
+        if batch_size is None or batch_size >= nobs:
+            batch_size = nobs
+        # Buffers reused by every update. Sparse batches are picked out by
+        # indexing, which only copies their nonzeros.
+        if not sparse.issparse(inputs):
+            input_buf = np.empty((batch_size, self.m), dtype=inputs.dtype)
+        target_buf = np.empty((batch_size, self.n))
+        error_buf = np.empty((batch_size, self.n))
+        update = np.empty_like(weights)
+        order = np.arange(nobs)
 
+        # Training
         for n in range(max_iter):
-            outputs = self.predict(inputs, weights, add_bias=False)
-            weights += eta * np.dot(inputs.T, targets - outputs)
-
-            # Randomize order of inputs
-            np.random.shuffle(change)
-            inputs = inputs[change, :]
-            targets = targets[change, :]
+            if shuffle and batch_size < nobs:
+                np.random.shuffle(order)
+            mistakes = False
+            for start in range(0, nobs, batch_size):
+                batch = order[start:start + batch_size]
+                size = len(batch)
+                if size == nobs:
+                    X, T = inputs, targets
+                else:
+                    if sparse.issparse(inputs):
+                        X = inputs[batch]
+                    else:
+                        X = np.take(inputs, batch, axis=0,
+                                    out=input_buf[:size])
+                    T = np.take(targets, batch, axis=0, out=target_buf[:size])
+                error = error_buf[:size]
+                # error = targets - thresholded outputs
+                weighted_sum(X, weights, out=error)
+                np.greater(error, 0, out=error)
+                np.subtract(T, error, out=error)
+                mistakes = mistakes or error.any()
+                _input_dot(X, error, out=update[:-1])
+                # the bias node's input is -1
+                np.sum(error, axis=0, out=update[-1])
+                np.negative(update[-1], out=update[-1])
+                update *= eta
+                weights += update
+            if early_stop and not mistakes:
+                break
 
         self.weights = weights
 
-    def predict(self, inputs=None, weights=None, add_bias=True):
-        """ Run the network forward """
+    def _update(self, inputs, targets):
+        """
+        One update from a block of observations.
+        """
+        weights = self.weights
+        error = targets - (weighted_sum(inputs, weights) > 0)
+        weights[:-1] += self.eta * _input_dot(inputs, error)
+        weights[-1] -= self.eta * error.sum(0)
+
+    def partial_fit(self, inputs, targets, batch_size=None):
+        """
+        Update the network from one chunk of data.
+
+        The weights are initialized on the first call unless the network
+        has already been fit. Nothing is kept on the instance, so the data
+        can come from an iterator or an np.memmap that doesn't fit in
+        memory.
+
+        Parameters
+        ----------
+        inputs : array-like
+            The inputs data
+        targets : array-like
+            The targets to train on
+        batch_size : int, optional
+            The number of observations used for each weight update. The
+            default is the whole chunk.
+        """
+        inputs = _asarray(inputs)
+        targets = np.asarray(targets)
+        if targets.ndim == 1:
+            targets = targets[:, None]
+        if not hasattr(self, "weights"):
+            self.m = inputs.shape[1]
+            self.n = targets.shape[1]
+            self._init_weights()
+
+        nobs = inputs.shape[0]
+        batch_size = batch_size or nobs
+        for start in range(0, nobs, batch_size):
+            self._update(inputs[start:start + batch_size],
+                         targets[start:start + batch_size])
+        return self
+
+    def fit_stream(self, chunks, max_iter=1, batch_size=None):
+        """
+        Train the network on a stream of chunks with partial_fit.
+
+        Parameters
+        ----------
+        chunks : iterable or callable
+            Yields (inputs, targets) pairs, e.g. iter_chunks on a pair of
+            np.memmap arrays. For more than one pass give something that
+            can be iterated over again, like a list, or a function that
+            returns a new iterator.
+        max_iter : int
+            The number of passes through the stream
+        batch_size : int, optional
+            Passed to partial_fit
+        """
+        for n in range(max_iter):
+            stream = chunks() if callable(chunks) else chunks
+            for inputs, targets in stream:
+                self.partial_fit(inputs, targets, batch_size)
+        return self
+
+    def predict(self, inputs=None, weights=None, add_bias=True,
+                block_size=None):
+        """
+        Run the network forward
+
+        Parameters
+        ----------
+        inputs : array-like, optional
+            The inputs data. Defaults to the data the network was fit on.
+        weights : array-like, optional
+            The weights, including the bias node. Defaults to the fitted
+            weights.
+        add_bias : bool
+            If False, `inputs` already has the column of -1s for the
+            bias node.
+        block_size : int, optional
+            If given, the outputs are computed this many rows at a time
+            into a preallocated result, so no temporary is bigger than a
+            block.
+        """
         if weights is None:
             try:
                 weights = self.weights
@@ -91,13 +264,24 @@ class Perceptron(object):
                                  "or give weights")
         if inputs is None:
             inputs = self.inputs
-        if add_bias:
-            inputs = add_bias_node(inputs)
+        inputs = _asarray(inputs)
+        if not add_bias:
+            return np.where(inputs @ weights>0, 1, 0)
 
-        outputs = np.dot(inputs, weights)
+        nobs = inputs.shape[0]
+        if block_size is None or block_size >= nobs:
+            # Threshold the outputs
+            return np.where(weighted_sum(inputs, weights)>0, 1, 0)
 
-        # Threshold the outputs
-        return np.where(outputs>0, 1, 0)
+        outputs = np.empty((nobs, weights.shape[1]), dtype=int)
+        # np.dot only writes into an array of exactly its result type
+        buf = np.empty((block_size, weights.shape[1]),
+                       dtype=np.result_type(inputs.dtype, weights.dtype))
+        for start in range(0, nobs, block_size):
+            block = inputs[start:start + block_size]
+            out = weighted_sum(block, weights, out=buf[:block.shape[0]])
+            np.greater(out, 0, out=outputs[start:start + block_size])
+        return outputs
 
 
     def confusion_matrix(self, inputs, targets, weights, summary=True):
@@ -107,13 +291,10 @@ class Perceptron(object):
         If summary is True, returns percent correct, else returns
         the whole confusion matrix.
         """
-        inputs = np.asarray(inputs)
+        inputs = _asarray(inputs)
         targets = np.asarray(targets)
 
-        # Add the inputs that attach the bias node
-        inputs = add_bias_node(inputs)
-
-        outputs = np.dot(inputs, weights)
+        outputs = weighted_sum(inputs, np.asarray(weights))
 
         n_classes = targets.ndim == 1 and 1 or targets.shape[1]
 
@@ -0,0 +1,296 @@
+"""
+Monte Carlo for the diagonal random walk of the week 8 random walk
+notebook.
+
+At every step a walker moves one unit east or west and one unit north or
+south. The notebook draws every step of every walk as int64 at once, and
+reruns the simulation for each number of steps to see how the distance
+grows. Here the steps are drawn as random bits a chunk at a time, the
+positions carry over from one chunk to the next, and the mean distance is
+recorded after every step, so one pass gives the whole curve and the
+memory used doesn't depend on the number of steps.
+"""
+import itertools
+
+import numpy as np
+
+
+def random_path(initial_point, nsteps, seed=None):
+    """
+    The locations of a walker, starting from `initial_point`, with shape
+    (nsteps + 1, 2).
+    """
+    rng = np.random.default_rng(seed)
+    directions = rng.choice([-1, 1], size=(nsteps, 2))
+    path = initial_point + np.cumsum(directions, axis=0)
+    # append the initial point back to the front
+    return np.vstack((initial_point, path))
+
+
+def _chunk_steps(rng, nsteps, nruns):
+    # nsteps x nruns x 2 moves of -1 or 1, one random bit each
+    nbytes = -(-nsteps // 8)
+    bits = np.frombuffer(rng.bytes(nbytes * nruns * 2), dtype=np.uint8)
+    bits = np.unpackbits(bits.reshape(nbytes, nruns, 2), axis=0,
+                         count=nsteps)
+    # 0, 1 -> 255, 1, which is -1, 1 as int8
+    bits <<= 1
+    bits -= 1
+    return bits.view(np.int8)
+
+
+def mean_distances(nsteps, nruns, every=1, chunksize=2**22, seed=None):
+    """
+    The mean distance from the start of `nruns` walks after each step.
+
+    Parameters
+    ----------
+    nsteps : int
+        The length of the walks.
+    nruns : int
+        The number of walks.
+    every : int
+        Record the mean distance only after every `every` steps, which
+        keeps the result small for very long walks.
+    chunksize : int
+        About how many (step, walk) pairs to simulate at a time. The
+        memory used is about 25 bytes per pair.
+    seed : None, int, SeedSequence or Generator
+        Passed to np.random.default_rng.
+
+    Returns
+    -------
+    steps : ndarray
+        The numbers of steps, every, 2 * every, ... up to nsteps.
+    distances : ndarray
+        The mean distance after each of them.
+    """
+    rng = np.random.default_rng(seed)
+    chunk = max(chunksize // nruns, 1)
+    position = np.zeros((nruns, 2), dtype=np.int32)
+    steps = np.arange(every, nsteps + 1, every)
+    distances = np.empty(len(steps))
+
+    nrecorded = 0
+    for start in range(0, nsteps, chunk):
+        size = min(chunk, nsteps - start)
+        path = np.cumsum(_chunk_steps(rng, size, nruns), axis=0,
+                         dtype=np.int32)
+        path += position
+        position[...] = path[-1]
+
+        # the rows of this chunk that are at a multiple of `every` steps,
+        # row i being step start + i + 1
+        recorded = path[(every - 1 - start) % every::every]
+        n = len(recorded)
+        distances[nrecorded:nrecorded + n] = np.hypot(recorded[..., 0],
+                                                      recorded[..., 1]).mean(1)
+        nrecorded += n
+    return steps, distances
+
+
+def random_path_montecarlo(origin, nsteps, nruns, seed=None):
+    """
+    The mean distance from `origin` after `nsteps` steps over `nruns`
+    walks.
+    """
+    # the distance doesn't depend on where the walks start
+    return mean_distances(nsteps, nruns, every=nsteps, seed=seed)[1][-1]
+
+
+# Self-avoiding walks
+#
+# A walk that may not visit a site twice keeps the sites it has visited in
+# a dict from packed coordinates to the step they were visited at. The
+# default moves are the notebook's diagonal ones, but any set of lattice
+# moves can be given, e.g. SQUARE.
+
+DIAGONAL = np.array([[1, 1], [1, -1], [-1, 1], [-1, -1]])
+SQUARE = np.array([[1, 0], [-1, 0], [0, 1], [0, -1]])
+
+# the rotations and reflections of the lattice other than the identity,
+# which take (x, y) to (signs[0] * (x, y)[perm[0]], signs[1] * (x, y)[perm[1]])
+_PERMUTATIONS = np.array([[1, 0], [0, 1], [1, 0], [0, 1], [0, 1], [1, 0],
+                          [1, 0]])
+_SIGNS = np.array([[-1, 1], [-1, -1], [1, -1], [1, -1], [-1, 1], [1, 1],
+                   [-1, -1]])
+
+# coordinates have to be less than this in absolute value
+_OFFSET = 2**30
+
+# how many sites after a pivot are checked one at a time
+_NEAR = 64
+
+
+def pack(points):
+    """
+    Pack integer (x, y) coordinates into one int64 each.
+    """
+    points = np.asarray(points, dtype=np.int64)
+    return ((points[..., 0] + _OFFSET) << 32) + points[..., 1] + _OFFSET
+
+
+def _pivot(points, center, symmetry):
+    """
+    Rotate or reflect `points` about `center` with symmetry number
+    `symmetry`.
+    """
+    perm = _PERMUTATIONS[symmetry]
+    moved = points[:, perm]
+    moved -= center[perm]
+    moved *= _SIGNS[symmetry]
+    moved += center
+    return moved
+
+
+def is_self_avoiding(path):
+    """
+    Whether a path never visits the same site twice.
+    """
+    return len(np.unique(pack(path))) == len(path)
+
+
+def self_avoiding_walk(nsteps, obstacles=None, moves=DIAGONAL, max_tries=1000,
+                       seed=None):
+    """
+    Grow a self-avoiding walk from the origin.
+
+    Each step is chosen at random from the moves to sites that are free,
+    and the walk starts over if it traps itself. This is fast, but the
+    walks it makes aren't all equally likely and it traps itself more and
+    more often as the walks get longer. Use pivot_walk for long walks.
+
+    Parameters
+    ----------
+    nsteps : int
+        The length of the walk.
+    obstacles : array-like, optional
+        (x, y) sites the walk can't visit.
+    moves : array-like
+        The possible moves.
+    max_tries : int
+        How many times to start over before giving up.
+    seed : None, int, SeedSequence or Generator
+        Passed to np.random.default_rng.
+
+    Returns
+    -------
+    path : ndarray
+        The sites visited, with shape (nsteps + 1, 2).
+    """
+    rng = np.random.default_rng(seed)
+    moves = np.asarray(moves, dtype=np.int64)
+    blocked = set()
+    if obstacles is not None:
+        blocked.update(pack(np.reshape(obstacles, (-1, 2))).tolist())
+    move_keys = pack(moves) - pack([0, 0])
+    origin = int(pack([0, 0]))
+    if origin in blocked:
+        raise ValueError("the origin is blocked")
+
+    path = np.zeros((nsteps + 1, 2), dtype=np.int64)
+    for attempt in range(max_tries):
+        key = origin
+        visited = {key}
+        choices = rng.random(nsteps)
+        for i in range(nsteps):
+            free = [j for j, step in enumerate(move_keys.tolist())
+                    if key + step not in visited and key + step not in blocked]
+            if not free:
+                break
+            j = free[int(choices[i] * len(free))]
+            key += int(move_keys[j])
+            visited.add(key)
+            path[i + 1] = path[i] + moves[j]
+        else:
+            return path
+    raise RuntimeError("no self-avoiding walk found in %d tries" % max_tries)
+
+
+def pivot_walk(nsteps, npivots=None, moves=DIAGONAL, seed=None):
+    """
+    A self-avoiding walk from the pivot algorithm.
+
+    Starting from a straight walk, a random site is picked and the part of
+    the walk on its shorter side is rotated or reflected about it. The
+    move is kept if the walk still avoids itself. Collisions are most
+    likely close to the pivot, so the moved sites are checked from there
+    outwards and most rejected moves are found after a few lookups. After enough pivots the
+    walk is a sample from all self-avoiding walks of this length, each
+    equally likely.
+
+    Parameters
+    ----------
+    nsteps : int
+        The length of the walk.
+    npivots : int, optional
+        The number of pivots to try. Defaults to 10 * nsteps.
+    moves : array-like
+        The possible moves. They should be closed under rotating and
+        reflecting the lattice, like DIAGONAL and SQUARE.
+    seed : None, int, SeedSequence or Generator
+        Passed to np.random.default_rng.
+
+    Returns
+    -------
+    path : ndarray
+        The sites visited, with shape (nsteps + 1, 2).
+    """
+    rng = np.random.default_rng(seed)
+    if npivots is None:
+        npivots = 10 * nsteps
+    step = np.asarray(moves, dtype=np.int64)[0]
+    path = np.arange(nsteps + 1)[:, None] * step
+    keys = pack(path)
+    # site -> the step it's visited at. Entries for sites the walk has
+    # moved away from are left in and recognized because keys[step] is
+    # no longer the site, which saves deleting the old tail.
+    index = dict(zip(keys.tolist(), range(nsteps + 1)))
+
+    if nsteps < 2:
+        return path
+    pivots = rng.integers(1, nsteps, size=npivots)
+    symmetries = rng.integers(len(_SIGNS), size=npivots)
+    for k, symmetry in zip(pivots.tolist(), symmetries.tolist()):
+        # Move whichever side of the pivot is shorter. Turning the head
+        # instead of the tail gives the same walk up to a rotation or
+        # reflection of the whole, and the walk is moved back to the origin
+        # at the end. The moved sites only have to miss the sites
+        # [lo, hi] that stay put.
+        if 2 * k < nsteps:
+            start, stop, lo, hi = 0, k, k, nsteps
+            split = max(k - _NEAR, 0)
+            near, far = slice(split, stop), slice(start, split)
+        else:
+            start, stop, lo, hi = k + 1, nsteps + 1, 0, k
+            split = min(k + 1 + _NEAR, stop)
+            near, far = slice(start, split), slice(split, stop)
+        # Most collisions are next to the pivot, so those sites are moved
+        # and looked up one at a time first, from the pivot outwards, and
+        # the rest are only moved if they all miss.
+        near_sites = _pivot(path[near], path[k], symmetry)
+        near_keys = pack(near_sites)
+        near_list = near_keys.tolist()
+        if start == 0:
+            near_list.reverse()
+        if any(lo <= index.get(key, -1) <= hi and keys[index[key]] == key
+               for key in near_list):
+            continue
+        far_sites = _pivot(path[far], path[k], symmetry)
+        far_keys = pack(far_sites)
+        if len(far_keys):
+            steps = np.fromiter(map(index.get, far_keys.tolist(),
+                                    itertools.repeat(-1)),
+                                dtype=np.int64, count=len(far_keys))
+            hit = (steps >= lo) & (steps <= hi)
+            if hit.any() and (keys[steps[hit]] == far_keys[hit]).any():
+                continue
+        path[near] = near_sites
+        path[far] = far_sites
+        keys[near] = near_keys
+        keys[far] = far_keys
+        index.update(zip(keys[start:stop].tolist(), range(start, stop)))
+        if len(index) > 4 * (nsteps + 1):
+            index = dict(zip(keys.tolist(), range(nsteps + 1)))
+    path -= path[0]
+    return path